@@ -0,0 +1,307 @@
+"""Throughput and peak memory of the hot paths, without a Streamlit server.
+
+Builds seeded synthetic banks and Markdown dumps of growing size, then times
+bank loading (YAML and compiled), the near-duplicate index, paper selection,
+scoring, Markdown parsing and math normalization. Results can be saved as
+JSON and compared against a stored baseline.
+
+    python benchmarks/hot_paths.py [--sizes 250,1000,10000,100000]
+        [--output results.json] [--baseline baseline.json] [--tolerance 0.25]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import bank as bank_module  # noqa: E402
+from bank import compile_bank, compiled_path, get_bank  # noqa: E402
+from dedup import build_index  # noqa: E402
+from sampling import generate_paper, refresh_recent, weighted_sample  # noqa: E402
+from scoring import answer_key, score_batch, score_submission  # noqa: E402
+from utils import fix_math_format, parse_markdown_questions  # noqa: E402
+
+# Same paper layout and history length as the app
+SECTIONS = (("cs", 36), ("math", 24), ("logical_reasoning", 15))
+CATEGORY_SHARE = (("cs", 0.6), ("math", 0.25), ("logical_reasoning", 0.15))
+MAX_USAGE_HISTORY = 50
+SUBMISSIONS = 1000
+
+_WORDS = (
+    "register memory cache stack queue process thread kernel page frame "
+    "address pointer array tree graph node edge vertex matrix vector limit "
+    "series function set union subset relation order sort search hash key "
+    "value table column row number pattern sequence circle arrangement code"
+).split()
+
+
+# --- Synthetic data ---
+def _sentence(rng, words):
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _math_text(rng):
+    # Plain-text powers and sets, the shapes fix_math_format rewrites
+    var = rng.choice("xyabn")
+    return (
+        f"If {var} 2 + {rng.randint(2, 99)} {var} = {rng.randint(100, 999)} "
+        f"and A ' U B ' holds, find 2 n for {_sentence(rng, 6)}"
+    )
+
+
+def synthetic_bank(size, seed=0):
+    """A bank dict of ``size`` questions split across categories like the real one."""
+    rng = random.Random(seed)
+    data = {}
+    for category, share in CATEGORY_SHARE:
+        questions = []
+        for _ in range(max(1, round(size * share))):
+            if category == "math":
+                text = _math_text(rng)
+            else:
+                text = f"{_sentence(rng, rng.randint(8, 24))}?"
+            options = [_sentence(rng, rng.randint(1, 4)) for _ in range(4)]
+            questions.append(
+                {"question": text, "options": options, "answer": rng.choice(options)}
+            )
+        data[category] = questions
+    return data
+
+
+def synthetic_markdown(size, seed=0):
+    """A Qtemp.md-style dump: "Question N", text, four options, "+4" after the answer."""
+    rng = random.Random(seed)
+    lines = []
+    for n in range(1, size + 1):
+        lines.append(f"Question {n}")
+        lines.append(_math_text(rng) if n % 4 == 0 else f"{_sentence(rng, 12)}?")
+        answer = rng.randrange(4)
+        for k in range(4):
+            lines.append(_sentence(rng, 3))
+            if k == answer:
+                lines.append("+4")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def usage_history(bank, seed=0):
+    """Most-recent-first history of a candidate who sat one paper before."""
+    rng = random.Random(seed)
+    paper = generate_paper(bank, SECTIONS, rng=rng, distinct=False)
+    return [bank.id_of(index) for index in paper][:MAX_USAGE_HISTORY]
+
+
+# --- Measurement ---
+def measure(fn, repeat=5, budget=2.0):
+    """Times ``fn`` up to ``repeat`` times (at least once, within ``budget``
+    seconds), then runs it once more under tracemalloc for the peak memory."""
+    times = []
+    started = time.perf_counter()
+    while len(times) < repeat and (
+        not times or time.perf_counter() - started < budget
+    ):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "runs": len(times),
+        "median_s": statistics.median(times),
+        "best_s": min(times),
+        "peak_kib": peak / 1024,
+    }
+
+
+def bench_bank(size, workdir, seed):
+    path = os.path.join(workdir, f"bank_{size}.yaml")
+    with open(path, "w") as f:
+        yaml.safe_dump(synthetic_bank(size, seed), f, sort_keys=False)
+    results = {}
+
+    def cold_load():
+        bank_module._cache.pop(os.path.abspath(path), None)
+        bank = get_bank(path)
+        # The last question, without building the ID index as a side effect
+        bank.question(sum(len(bank[category]) for category in bank) - 1)
+        return bank
+
+    results["load_yaml"] = (measure(cold_load, repeat=3), size)
+    compile_bank(path)
+    results["load_compiled"] = (measure(cold_load), size)
+    os.remove(compiled_path(path))
+
+    bank = cold_load()
+    results["dedup_index"] = (measure(lambda: build_index(bank), repeat=3), size)
+    history = usage_history(bank, seed)
+    bank.duplicates  # built once per bank, like in the app
+    rng = random.Random(seed)
+
+    results["generate_paper"] = (
+        measure(lambda: generate_paper(bank, SECTIONS, history, rng=rng)),
+        1,
+    )
+    pooled = generate_paper(bank, SECTIONS, rng=rng)
+    results["refresh_recent"] = (
+        measure(lambda: refresh_recent(bank, pooled[:], history, rng=rng)),
+        1,
+    )
+    cs = bank["cs"]
+    cs_ids = bank.ids("cs")
+    results["weighted_sample"] = (
+        measure(lambda: weighted_sample(cs, 36, history, ids=cs_ids, rng=rng)),
+        1,
+    )
+
+    categories = [category for category, _ in SECTIONS]
+    paper = generate_paper(bank, SECTIONS, rng=rng)
+    answers, sections = answer_key(bank, paper, categories)
+    np_rng = np.random.default_rng(seed)
+    choices = np_rng.integers(0, 5, (SUBMISSIONS, len(paper)))
+    times = np_rng.uniform(5, 90, (SUBMISSIONS, len(paper)))
+    results["answer_key"] = (
+        measure(lambda: answer_key(bank, paper, categories)),
+        len(paper),
+    )
+    results["score_submission"] = (
+        measure(
+            lambda: score_submission(
+                choices[0], answers, sections, times[0], len(categories)
+            )
+        ),
+        1,
+    )
+    batch_answers = np.tile(answers, (SUBMISSIONS, 1))
+    batch_sections = np.tile(sections, (SUBMISSIONS, 1))
+    results["score_batch"] = (
+        measure(
+            lambda: score_batch(
+                choices, batch_answers, batch_sections, times, len(categories)
+            )
+        ),
+        SUBMISSIONS,
+    )
+    return results
+
+
+def bench_markdown(size, seed):
+    content = synthetic_markdown(size, seed)
+    strings = [
+        s
+        for q in parse_markdown_questions(content)
+        for s in (q["question"], *q["options"])
+    ]
+    return {
+        "parse_markdown_questions": (
+            measure(lambda: parse_markdown_questions(content)),
+            size,
+        ),
+        "fix_math_format": (
+            measure(lambda: [fix_math_format(s) for s in strings]),
+            len(strings),
+        ),
+    }
+
+
+def run_suite(sizes, seed=0):
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            for group in (bench_bank(size, workdir, seed), bench_markdown(size, seed)):
+                for name, (stats, items) in group.items():
+                    rows.append(
+                        {
+                            "name": name,
+                            "size": size,
+                            "items_per_s": items / stats["median_s"],
+                            **stats,
+                        }
+                    )
+                    print(
+                        f"{name:>26} n={size:<7} {stats['median_s'] * 1000:10.3f} ms "
+                        f"{rows[-1]['items_per_s']:14.1f} items/s "
+                        f"{stats['peak_kib']:10.1f} KiB peak",
+                        flush=True,
+                    )
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "seed": seed,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": rows,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Prints the change against ``baseline``; returns the rows that got slower."""
+    previous = {(row["name"], row["size"]): row for row in baseline["results"]}
+    regressions = []
+    print(f"\n{'benchmark':>26} {'size':>7} {'baseline ms':>12} {'now ms':>10} {'change':>8}")
+    for row in results["results"]:
+        old = previous.get((row["name"], row["size"]))
+        if old is None:
+            continue
+        change = row["median_s"] / old["median_s"] - 1
+        flag = ""
+        if change > tolerance:
+            regressions.append(row)
+            flag = "  SLOWER"
+        print(
+            f"{row['name']:>26} {row['size']:>7} {old['median_s'] * 1000:12.3f} "
+            f"{row['median_s'] * 1000:10.3f} {change:+8.1%}{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default="250,1000,10000,100000",
+        help="Comma-separated bank sizes (questions) and Markdown dump sizes",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Relative slowdown against the baseline that counts as a regression",
+    )
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = run_suite(sizes, args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Server CPU per exam interaction, measured against a real Streamlit server.
+
+Starts ``streamlit run src/app.py``, drives one candidate through the exam
+(answer, Next, palette jumps) over the websocket and reports the server's
+CPU time and bytes sent per interaction type.
+
+    python benchmarks/interaction_cpu.py [--port 8765] [--questions 75]
+"""
+
+import argparse
+import json
+import statistics
+import uuid
+
+from streamlit_client import AppSession, process_cpu_seconds, run, start_server
+
+
+async def measure(port, server_pid, questions):
+    session = AppSession(
+        f"http://127.0.0.1:{port}", query_string=f"token={uuid.uuid4().hex}"
+    )
+    await session.connect()
+    samples = {"answer": [], "next": [], "palette": []}
+
+    async def timed(kind, action):
+        cpu = process_cpu_seconds(server_pid)
+        sent = session.bytes_received
+        await action
+        samples[kind].append(
+            (process_cpu_seconds(server_pid) - cpu, session.bytes_received - sent)
+        )
+
+    await session.click(session.find("button", label="Start Exam"))
+    for i in range(questions - 1):
+        await timed("answer", session.choose(session.find("radio", key=f"radio_{i}"), 0))
+        await timed("next", session.click(session.find("button", label="Next")))
+    for i in range(0, questions, 3):
+        await timed("palette", session.click(session.find("button", key=f"nav_{i}")))
+    session.close()
+
+    return {
+        kind: {
+            "count": len(rows),
+            "cpu_ms_mean": 1000 * statistics.fmean(cpu for cpu, _ in rows),
+            "bytes_mean": statistics.fmean(size for _, size in rows),
+        }
+        for kind, rows in samples.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--questions", type=int, default=75)
+    args = parser.parse_args()
+
+    server = start_server(args.port)
+    try:
+        result = run(measure(args.port, server.pid, args.questions))
+    finally:
+        server.terminate()
+        server.wait()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
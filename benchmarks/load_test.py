@@ -0,0 +1,218 @@
+"""Concurrent-candidate load test against a real Streamlit server.
+
+For each N in ``--users``, starts ``streamlit run src/app.py`` and drives N
+simulated candidates at once over the websocket through the whole exam:
+start, answer and move through every question, jump around the palette,
+then submit. Reports p50/p95/p99 rerun latency per action, server CPU and
+peak RSS for each N. Everything runs locally; nothing external is needed.
+
+    python benchmarks/load_test.py [--users 1,5,10,25] [--think-time 0.5]
+        [--output load.json] [--baseline load.json] [--tolerance 0.25]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+import uuid
+
+from streamlit_client import (
+    AppSession,
+    process_cpu_seconds,
+    process_rss_bytes,
+    run,
+    start_server,
+)
+
+ACTIONS = ("connect", "start", "answer", "next", "palette", "submit")
+
+
+def percentiles(samples):
+    """p50/p95/p99 of ``samples`` in milliseconds (None if there are none)."""
+    if not samples:
+        return {"count": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+    if len(samples) == 1:
+        cuts = samples * 99
+    else:
+        cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "count": len(samples),
+        "p50_ms": 1000 * cuts[49],
+        "p95_ms": 1000 * cuts[94],
+        "p99_ms": 1000 * cuts[98],
+    }
+
+
+async def candidate(url, questions, think_time, samples, seed):
+    """One candidate's full exam; appends (action, seconds) to ``samples``."""
+    rng = random.Random(seed)
+    session = AppSession(url, query_string=f"token={uuid.uuid4().hex}")
+
+    async def timed(action, step):
+        if think_time:
+            await asyncio.sleep(rng.uniform(0, think_time))
+        started = time.perf_counter()
+        await step
+        samples.append((action, time.perf_counter() - started))
+
+    try:
+        await timed("connect", session.connect())
+        await timed("start", session.click(session.find("button", label="Start Exam")))
+        for i in range(questions):
+            radio = session.find("radio", key=f"radio_{i}")
+            choice = rng.randrange(len(radio.proto.options))
+            await timed("answer", session.choose(radio, choice))
+            if i < questions - 1:
+                await timed("next", session.click(session.find("button", label="Next")))
+        for _ in range(5):
+            nav = session.find("button", key=f"nav_{rng.randrange(questions)}")
+            await timed("palette", session.click(nav))
+        submit = session.find("button", label="Submit Exam")
+        await timed("submit", session.click(submit))
+        session.find("button", label="Retake Exam")
+    finally:
+        session.close()
+
+
+async def sample_rss(pid, peak, stop):
+    while not stop.is_set():
+        peak[0] = max(peak[0], process_rss_bytes(pid))
+        await asyncio.sleep(0.1)
+
+
+async def load_step(url, pid, users, questions, think_time, seed):
+    samples = []
+    peak = [process_rss_bytes(pid)]
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(pid, peak, stop))
+
+    cpu = process_cpu_seconds(pid)
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(
+        *(
+            candidate(url, questions, think_time, samples, seed + n)
+            for n in range(users)
+        ),
+        return_exceptions=True,
+    )
+    wall = time.perf_counter() - started
+    cpu = process_cpu_seconds(pid) - cpu
+    stop.set()
+    await sampler
+
+    errors = [repr(out) for out in outcomes if isinstance(out, BaseException)]
+    return {
+        "users": users,
+        "completed": users - len(errors),
+        "errors": errors[:5],
+        "wall_s": wall,
+        "server_cpu_s": cpu,
+        "server_cpu_util": cpu / wall,
+        "server_peak_rss_mib": peak[0] / 2**20,
+        "reruns_per_s": len(samples) / wall,
+        "all": percentiles([seconds for _, seconds in samples]),
+        "actions": {
+            action: percentiles([s for a, s in samples if a == action])
+            for action in ACTIONS
+        },
+    }
+
+
+def report(step):
+    overall = step["all"]
+    if not overall["count"]:
+        print(f"users={step['users']:<4} no rerun completed", flush=True)
+    else:
+        print(
+            f"users={step['users']:<4} done={step['completed']:<4} "
+            f"p50={overall['p50_ms']:8.1f} ms p95={overall['p95_ms']:8.1f} ms "
+            f"p99={overall['p99_ms']:8.1f} ms  cpu={step['server_cpu_util']:6.1%} "
+            f"rss={step['server_peak_rss_mib']:7.1f} MiB "
+            f"{step['reruns_per_s']:7.1f} reruns/s",
+            flush=True,
+        )
+    for error in step["errors"]:
+        print(f"    error: {error}", flush=True)
+
+
+def compare(steps, baseline, tolerance):
+    """Prints p95 against ``baseline``; returns the steps that got slower."""
+    previous = {step["users"]: step for step in baseline["steps"]}
+    regressions = []
+    print(f"\n{'users':>6} {'baseline p95':>13} {'now p95':>10} {'change':>8}")
+    for step in steps:
+        old = previous.get(step["users"])
+        if old is None or not old["all"]["count"] or not step["all"]["count"]:
+            continue
+        change = step["all"]["p95_ms"] / old["all"]["p95_ms"] - 1
+        flag = ""
+        if change > tolerance or step["completed"] < old["completed"]:
+            regressions.append(step)
+            flag = "  WORSE"
+        print(
+            f"{step['users']:>6} {old['all']['p95_ms']:13.1f} "
+            f"{step['all']['p95_ms']:10.1f} {change:+8.1%}{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--users", default="1,5,10,25", help="Comma-separated N values")
+    parser.add_argument("--questions", type=int, default=75)
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=0.0,
+        help="Upper bound of a random pause before each action, in seconds",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    steps = []
+    for users in (int(n) for n in args.users.split(",")):
+        # A fresh server per step, so RSS and caches don't carry over
+        server = start_server(args.port)
+        try:
+            step = run(
+                load_step(
+                    f"http://127.0.0.1:{args.port}",
+                    server.pid,
+                    users,
+                    args.questions,
+                    args.think_time,
+                    args.seed,
+                )
+            )
+        finally:
+            server.terminate()
+            server.wait()
+        report(step)
+        steps.append(step)
+
+    results = {
+        "questions": args.questions,
+        "think_time": args.think_time,
+        "steps": steps,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    failed = any(step["errors"] for step in steps)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failed = bool(compare(steps, baseline, args.tolerance)) or failed
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Minimal headless Streamlit client for benchmarks and load tests.
+
+Speaks the same websocket protocol as the browser: sends ``rerun_script``
+BackMsgs with widget states (optionally scoped to a fragment) and waits for
+``script_finished``. Only the widgets the mock test uses are understood.
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from tornado.httpclient import HTTPClient, HTTPClientError
+from tornado.websocket import websocket_connect
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_EARLY_FOR_RERUN = ForwardMsg.FINISHED_EARLY_FOR_RERUN
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+class Widget:
+    def __init__(self, kind, proto, fragment_id):
+        self.kind = kind
+        self.proto = proto
+        self.fragment_id = fragment_id or None
+
+    @property
+    def id(self):
+        return self.proto.id
+
+    @property
+    def label(self):
+        return self.proto.label
+
+
+class AppSession:
+    """One browser tab: a websocket plus the widget states it would send."""
+
+    def __init__(self, url, query_string=""):
+        self.url = url
+        self.query_string = query_string
+        self.widgets = {}  # widget id -> Widget, most recently rendered last
+        self.values = {}  # widget id -> persisted WidgetState
+        self.messages = 0
+        self.bytes_received = 0
+        self._conn = None
+
+    async def connect(self):
+        self._conn = await websocket_connect(
+            f"{self.url.replace('http', 'ws', 1)}/_stcore/stream",
+            subprotocols=["streamlit"],
+            max_message_size=64 * 1024 * 1024,
+        )
+        await self.rerun()
+        return self
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+    async def rerun(self, trigger=None, fragment_id=None):
+        """Sends one rerun request and waits for the run to finish."""
+        msg = BackMsg()
+        state = msg.rerun_script
+        state.query_string = self.query_string
+        state.page_script_hash = ""
+        for value in self.values.values():
+            state.widget_states.widgets.add().CopyFrom(value)
+        if trigger is not None:
+            state.widget_states.widgets.add().CopyFrom(trigger)
+        if fragment_id:
+            state.fragment_id = fragment_id
+        await self._conn.write_message(msg.SerializeToString(), binary=True)
+        await self._drain()
+
+    async def _drain(self):
+        while True:
+            raw = await self._conn.read_message()
+            if raw is None:
+                raise ConnectionError("server closed the websocket")
+            self.messages += 1
+            self.bytes_received += len(raw)
+            fwd = ForwardMsg()
+            fwd.ParseFromString(raw)
+            kind = fwd.WhichOneof("type")
+            if kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                element = fwd.delta.new_element
+                element_kind = element.WhichOneof("type")
+                if element_kind in ("button", "radio"):
+                    proto = getattr(element, element_kind)
+                    self.widgets.pop(proto.id, None)
+                    self.widgets[proto.id] = Widget(
+                        element_kind, proto, fwd.delta.fragment_id
+                    )
+            elif kind == "script_finished" and fwd.script_finished != _EARLY_FOR_RERUN:
+                return
+
+    def find(self, kind, key=None, label=None):
+        """Most recently rendered widget matching a user key suffix or a label."""
+        for widget in reversed(list(self.widgets.values())):
+            if widget.kind != kind:
+                continue
+            if key is not None and widget.id.endswith(f"-{key}"):
+                return widget
+            if label is not None and label in widget.label:
+                return widget
+        raise LookupError(f"no {kind} with key={key!r} label={label!r}")
+
+    async def click(self, widget):
+        trigger = BackMsg().rerun_script.widget_states.widgets.add()
+        trigger.id = widget.id
+        trigger.trigger_value = True
+        await self.rerun(trigger, widget.fragment_id)
+
+    async def choose(self, widget, option_index):
+        value = BackMsg().rerun_script.widget_states.widgets.add()
+        value.id = widget.id
+        value.string_value = widget.proto.options[option_index]
+        self.values[widget.id] = value
+        await self.rerun(fragment_id=widget.fragment_id)
+
+
+def process_cpu_seconds(pid):
+    """User + system CPU seconds used so far by ``pid`` (Linux)."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+
+
+def process_rss_bytes(pid):
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def start_server(port, app="src/app.py", extra_args=(), env=None):
+    """Starts ``streamlit run`` headless from the repo root and waits until it's up."""
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "streamlit",
+            "run",
+            app,
+            "--server.headless=true",
+            f"--server.port={port}",
+            "--server.fileWatcherType=none",
+            "--browser.gatherUsageStats=false",
+            *extra_args,
+        ],
+        cwd=ROOT,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    client = HTTPClient()
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            client.fetch(f"http://127.0.0.1:{port}/_stcore/health")
+            break
+        except (ConnectionError, HTTPClientError, OSError):
+            if proc.poll() is not None or time.monotonic() > deadline:
+                proc.kill()
+                raise RuntimeError("streamlit server did not start")
+            time.sleep(0.2)
+    client.close()
+    return proc
+
+
+def run(coro):
+    return asyncio.run(coro)
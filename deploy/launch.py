@@ -0,0 +1,166 @@
+"""Runs several app processes behind nginx with sticky sessions.
+
+One Streamlit process runs every session on a single interpreter, so it is
+bound to one core. This starts ``--workers`` copies of ``src/app.py`` on
+consecutive local ports. They all map the same compiled question bank, so
+its pages are shared through the page cache, and they share the SQLite
+usage and checkpoint stores in the repo root. It also renders an nginx config
+that keeps each browser on one worker, and with ``--nginx`` it runs nginx in
+the foreground as well. Workers that exit are restarted.
+
+    python deploy/launch.py [--workers 4] [--port 8501] [--base-port 8601]
+        [--run-dir .run] [--nginx]
+"""
+
+import argparse
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from bank import ensure_compiled  # noqa: E402
+
+# The app opens QUESTIONS_FILE relative to its working directory, the repo root
+BANK_FILE = os.path.join(ROOT, "QuestionBank.yaml")
+TEMPLATE = os.path.join(ROOT, "deploy", "nginx.conf.template")
+
+
+def render_nginx_conf(listen, ports, run_dir, template=TEMPLATE):
+    """Fills in the nginx config template for workers on ``ports``."""
+    with open(template) as f:
+        conf = f.read()
+    servers = "\n".join(f"        server 127.0.0.1:{port};" for port in ports)
+    return (
+        conf.replace("@RUN_DIR@", os.path.abspath(run_dir))
+        .replace("@LISTEN@", str(listen))
+        .replace("@SERVERS@", servers)
+    )
+
+
+def worker_env(port):
+    env = {**os.environ, "MOCKOUT_WORKER": str(port)}
+    # One metrics file per worker; the textfile collector reads them all
+    metrics_file = env.get("MOCKOUT_METRICS_FILE")
+    if metrics_file:
+        root, ext = os.path.splitext(metrics_file)
+        env["MOCKOUT_METRICS_FILE"] = f"{root}-{port}{ext}"
+    return env
+
+
+def start_worker(port, run_dir):
+    """Starts one headless app process on ``port``, logging to the run directory."""
+    with open(os.path.join(run_dir, f"worker-{port}.log"), "ab") as log:
+        return subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "streamlit",
+                "run",
+                "src/app.py",
+                "--server.headless=true",
+                "--server.address=127.0.0.1",
+                f"--server.port={port}",
+                "--server.fileWatcherType=none",
+                "--browser.gatherUsageStats=false",
+            ],
+            cwd=ROOT,
+            env=worker_env(port),
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+
+
+def wait_healthy(port, proc, timeout=60):
+    url = f"http://127.0.0.1:{port}/_stcore/health"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(url, timeout=2):
+                return
+        except OSError:
+            if proc.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"worker on port {port} did not start")
+            time.sleep(0.2)
+
+
+def supervise(workers, nginx, run_dir, interval=1.0):
+    """Restarts workers that exit; returns when nginx does (never without it)."""
+    while nginx is None or nginx.poll() is None:
+        time.sleep(interval)
+        for port, proc in workers.items():
+            if proc.poll() is not None:
+                print(
+                    f"worker on port {port} exited with {proc.returncode}, restarting",
+                    flush=True,
+                )
+                workers[port] = start_worker(port, run_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(), help="Default: CPU count"
+    )
+    parser.add_argument("--port", type=int, default=8501, help="Port nginx listens on")
+    parser.add_argument(
+        "--base-port", type=int, default=8601, help="First worker port"
+    )
+    parser.add_argument(
+        "--run-dir",
+        default=os.path.join(ROOT, ".run"),
+        help="Where the nginx config, pid file and logs go",
+    )
+    parser.add_argument(
+        "--nginx", action="store_true", help="Also run nginx in the foreground"
+    )
+    args = parser.parse_args()
+
+    run_dir = os.path.abspath(args.run_dir)
+    os.makedirs(run_dir, exist_ok=True)
+    # Compile once up front, so no worker falls back to its own YAML parse
+    artifact = ensure_compiled(BANK_FILE)
+    print(f"Question bank: {os.path.relpath(artifact, ROOT)}", flush=True)
+
+    ports = [args.base_port + n for n in range(args.workers)]
+    conf_path = os.path.join(run_dir, "nginx.conf")
+    with open(conf_path, "w") as f:
+        f.write(render_nginx_conf(args.port, ports, run_dir))
+
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    workers = {}
+    nginx = None
+    try:
+        for port in ports:
+            workers[port] = start_worker(port, run_dir)
+        for port, proc in workers.items():
+            wait_healthy(port, proc)
+        print(f"{len(ports)} workers up on ports {ports[0]}-{ports[-1]}", flush=True)
+
+        nginx_cmd = ["nginx", "-p", run_dir, "-e", os.path.join(run_dir, "error.log")]
+        nginx_cmd += ["-c", conf_path, "-g", "daemon off;"]
+        if args.nginx:
+            nginx = subprocess.Popen(nginx_cmd)
+            print(f"Serving on http://localhost:{args.port}", flush=True)
+        else:
+            print(f"nginx config: {conf_path}\nRun: {shlex.join(nginx_cmd)}", flush=True)
+        supervise(workers, nginx, run_dir)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        procs = [*workers.values(), nginx]
+        for proc in procs:
+            if proc is not None and proc.poll() is None:
+                proc.terminate()
+        for proc in procs:
+            if proc is not None:
+                proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,187 +1,111 @@
 import streamlit as st
 import yaml
-import random
 import time
 import re
-import copy
-import json
-import streamlit.components.v1 as components
+import uuid
+import contextlib
+import functools
+from array import array
+
+import checkpoint_store
+import instrumentation
+import item_stats
+import results_log
+import search
+import usage_store
+from app_styles import app_styles
+from bank import get_bank
+from exam_timer import exam_timer
+from paper_pool import get_paper_pool
+from sampling import generate_paper
+from scoring import MarkingScheme, answer_key, score_submission
 
 # --- Constants ---
 QUESTIONS_FILE = "QuestionBank.yaml"
-LOCAL_STORAGE_KEY = "mock_test_question_usage"
+USAGE_DB_FILE = "usage.db"
+CHECKPOINT_DB_FILE = "checkpoints.db"
+ITEM_STATS_DB_FILE = "item_stats.db"
+RESULTS_DIR = "results"  # Day-partitioned Parquet log of every submission
+TOKEN_PATTERN = re.compile(r"[0-9a-f]{32}")
 TOTAL_TIME_MINUTES = 90
 CS_COUNT = 36
 MATH_COUNT = 24
 LR_COUNT = 15
 MAX_USAGE_HISTORY = 50  # Keep track of last 50 question usages
+MARKING_SCHEME = MarkingScheme(correct=4, wrong=-1)
+PAPER_POOL_SIZE = 64  # Pre-assembled papers kept ready for burst starts
+# Bank category -> (display name, questions per paper)
+SECTIONS = {
+    "cs": ("Computer Science", CS_COUNT),
+    "math": ("Mathematics", MATH_COUNT),
+    "logical_reasoning": ("Logical Reasoning", LR_COUNT),
+}
 
 
 # --- Custom CSS ---
 def local_css():
-    st.markdown(
-        """
-    <style>
-        .stButton>button {
-            width: 100%;
-            border-radius: 5px;
-            height: 3em;
-        }
-        .question-card {
-            background-color: #f9f9f9;
-            padding: 10px 20px;
-            border-radius: 10px;
-            border: 1px solid #ddd;
-            margin-bottom: 10px;
-        }
-        .category-tag {
-            background-color: #e0f7fa;
-            color: #006064;
-            padding: 4px 8px;
-            border-radius: 4px;
-            font-size: 0.8em;
-            display: inline-block;
-        }
-        .timer-box {
-            font-size: 24px; 
-            font-weight: bold; 
-            color: #31333F; 
-            text-align: center; 
-            padding: 10px; 
-            border: 2px solid #4F8BF9; 
-            border-radius: 5px;
-            background-color: #f0f8ff;
-            margin-bottom: 20px;
-        }
-    </style>
-    """,
-        unsafe_allow_html=True,
-    )
+    """Links the app stylesheet; served as a cached static file, not per rerun."""
+    app_styles()
 
 
 # --- functions ---
-def init_usage_from_browser():
-    """Initializes usage history from browser's localStorage on app start."""
-    # Only run once per session
-    if "usage_init_attempted" in st.session_state:
-        return
+def get_browser_token():
+    """Returns this browser's usage-history token, kept in the ``token`` URL parameter.
 
-    st.session_state.usage_init_attempted = True
-
-    # JavaScript to read localStorage and store count for display
-    js_code = f"""
-    <script>
-        (function() {{
-            const storedData = localStorage.getItem('{LOCAL_STORAGE_KEY}');
-            let count = 0;
-            
-            if (storedData) {{
-                try {{
-                    const parsed = JSON.parse(storedData);
-                    const usageHistory = parsed.usage_history || [];
-                    count = usageHistory.length;
-                    
-                    // Log for debugging
-                    console.log('Loaded', count, 'question IDs from localStorage');
-                }} catch (e) {{
-                    console.error('Failed to parse usage history:', e);
-                }}
-            }}
-        }})();
-    </script>
+    New visitors get a random token; bookmarking or reloading the page keeps it.
     """
+    token = st.query_params.get("token", "")
+    if not TOKEN_PATTERN.fullmatch(token):
+        token = uuid.uuid4().hex
+        st.query_params["token"] = token
+    return token
 
-    components.html(js_code, height=0)
+
+def get_usage_store():
+    """Returns the process-wide usage-history store."""
+    return usage_store.get_usage_store(USAGE_DB_FILE, MAX_USAGE_HISTORY)
 
 
 def load_question_usage():
-    """Loads question usage history from browser localStorage."""
-    # JavaScript that both loads from localStorage AND returns the data
-    js_code = f"""
-    <script>
-        const storedData = localStorage.getItem('{LOCAL_STORAGE_KEY}');
-        let usageHistory = [];
-        
-        if (storedData) {{
-            try {{
-                const parsed = JSON.parse(storedData);
-                usageHistory = parsed.usage_history || [];
-                console.log('Loaded', usageHistory.length, 'question IDs from localStorage for selection');
-            }} catch (e) {{
-                console.error('Failed to parse usage history:', e);
-            }}
-        }}
-        
-        // Make available globally for debugging
-        window.currentUsageHistory = usageHistory;
-    </script>
-    <div id="usage-data" style="display:none">{{}}</div>
-    """
+    """Loads this browser's question usage history from the server-side store."""
+    return get_usage_store().get(get_browser_token())
 
-    # Execute JS
-    components.html(js_code, height=0)
 
-    # Return from session cache (which gets populated by save_question_usage)
-    # On first run, this will be empty, which is fine
-    return st.session_state.get("usage_history_cache", [])
+def save_question_usage(usage_history):
+    """Saves this browser's question usage history (bounded to MAX_USAGE_HISTORY)."""
+    get_usage_store().record(get_browser_token(), usage_history[:MAX_USAGE_HISTORY])
 
 
-def save_question_usage(usage_history):
-    """Saves question usage history to browser's localStorage using JavaScript."""
-    # Update cache
-    st.session_state.usage_history_cache = usage_history[:MAX_USAGE_HISTORY]
-
-    # JavaScript to write to localStorage
-    usage_json = json.dumps(usage_history[:MAX_USAGE_HISTORY])
-    js_code = f"""
-    <script>
-        (function() {{
-            const usageHistory = {usage_json};
-            const data = {{
-                usage_history: usageHistory,
-                last_updated: new Date().toISOString()
-            }};
-            
-            try {{
-                localStorage.setItem('{LOCAL_STORAGE_KEY}', JSON.stringify(data));
-                console.log('Saved', usageHistory.length, 'question IDs to localStorage');
-            }} catch (e) {{
-                console.error('Failed to save usage history:', e);
-            }}
-        }})();
-    </script>
-    """
+def clear_usage_history():
+    """Clears this browser's question usage history."""
+    get_usage_store().clear(get_browser_token())
 
-    components.html(js_code, height=0)
 
+def get_checkpoint_store():
+    """Returns the process-wide store of in-progress exams."""
+    return checkpoint_store.get_checkpoint_store(CHECKPOINT_DB_FILE)
+
+
+def get_item_stats():
+    """Returns the process-wide per-question statistics store."""
+    return item_stats.get_item_stats(ITEM_STATS_DB_FILE)
 
-def clear_usage_history():
-    """Clears the question usage history from browser localStorage."""
-    st.session_state.usage_history_cache = []
-    st.session_state.usage_history_loaded = True
-
-    js_code = f"""
-    <script>
-        (function() {{
-            try {{
-                localStorage.removeItem('{LOCAL_STORAGE_KEY}');
-                console.log('Question usage history cleared from localStorage');
-            }} catch (e) {{
-                console.error('Failed to clear usage history:', e);
-            }}
-        }})();
-    </script>
-    """
 
-    components.html(js_code, height=0)
+def get_results_log():
+    """Returns the process-wide append-only log of submissions."""
+    return results_log.get_results_log(RESULTS_DIR)
 
 
+def selection_weights(bank):
+    """Per-category weights from item statistics, favouring mid-difficulty items."""
+    return get_item_stats().weights(bank)
+
+
+@instrumentation.timed("load_questions")
 def load_questions():
-    """Loads questions from the YAML file."""
+    """Returns the shared, read-only question bank (parsed once per file change)."""
     try:
-        with open(QUESTIONS_FILE, "r") as f:
-            data = yaml.safe_load(f)
-        return data
+        return get_bank(QUESTIONS_FILE)
     except FileNotFoundError:
         st.error(f"File not found: {QUESTIONS_FILE}")
         return None
@@ -190,110 +114,97 @@ def load_questions():
         return None
 
 
-def get_question_id(question):
-    """Generate a unique ID for a question based on its content."""
-    # Use first 50 chars of question as ID
-    q_text = question.get("question", "")[:50]
-    return hash(q_text)
-
+@instrumentation.timed("select_questions")
+def select_questions(all_questions, rng=None, require=None, exclude=None):
+    """Randomly selects questions based on category counts with weighted selection.
 
-def weighted_sample(questions, count, usage_history, max_history=5):
-    """Sample questions WITHOUT replacement, with lower probability for recently used ones."""
-    if not questions or count <= 0:
-        return []
-
-    if len(questions) <= count:
-        return questions[:]
-
-    # Calculate weights based on persistent usage history
-    weights = []
-    for q in questions:
-        q_id = get_question_id(q)
-        # Find how recently this question was used in the persistent history
-        try:
-            recent_index = usage_history.index(q_id)
-            # More recent = lower weight (0.2 for most recent, gradually increases)
-            weight = 0.2 + (recent_index / max_history) * 0.8
-        except ValueError:
-            # Not in history = full weight
-            weight = 1.0
-        weights.append(weight)
-
-    # Weighted sampling WITHOUT replacement
-    selected = []
-    available_indices = list(range(len(questions)))
-    available_weights = weights[:]
-
-    for _ in range(count):
-        if not available_indices:
-            break
-        # Normalize weights for remaining items
-        total_weight = sum(available_weights)
-        if total_weight == 0:
-            # Fallback: pick randomly from remaining
-            pick = random.choice(range(len(available_indices)))
-        else:
-            normalized = [w / total_weight for w in available_weights]
-            pick = random.choices(
-                range(len(available_indices)), weights=normalized, k=1
-            )[0]
-
-        selected.append(questions[available_indices[pick]])
-        available_indices.pop(pick)
-        available_weights.pop(pick)
-
-    return selected
-
-
-def select_questions(all_questions):
-    """Randomly selects questions based on category counts with weighted selection."""
-    selected = []
-
-    # Load persistent usage history from file (not session state)
+    Papers normally come pre-assembled from the process-wide pool and only get
+    this browser's recency filter applied. Passing ``rng`` builds the paper
+    inline instead, for reproducible runs. ``require`` and ``exclude`` are
+    topic queries (see ``search.py``): sections are filled from questions
+    matching ``require`` first, and questions matching ``exclude`` are left
+    out. Both are looked up in the bank's inverted index, and the paper is
+    then built inline. Returns an ``array('I')`` of flat indices into
+    ``all_questions``. Raises ValueError for a malformed query.
+    """
+    # Load persistent usage history from the server-side store
     usage_history = load_question_usage()
 
-    if "cs" in all_questions:
-        cs_qs = weighted_sample(all_questions["cs"], CS_COUNT, usage_history)
-        for q in cs_qs:
-            q["category"] = "Computer Science"
-        selected.extend(cs_qs)
-
-    if "math" in all_questions:
-        math_qs = weighted_sample(all_questions["math"], MATH_COUNT, usage_history)
-        for q in math_qs:
-            q["category"] = "Mathematics"
-        selected.extend(math_qs)
-
-    if "logical_reasoning" in all_questions:
-        lr_qs = weighted_sample(
-            all_questions["logical_reasoning"], LR_COUNT, usage_history
+    counts = [(category, count) for category, (_, count) in SECTIONS.items()]
+    if require or exclude:
+        weights = selection_weights(all_questions)
+        if require:
+            matches = all_questions.search.search(require)
+            weights = search.required_weights(all_questions, matches, weights)
+        excluded = None
+        if exclude:
+            excluded = set(all_questions.search.search(exclude).tolist())
+        paper = generate_paper(
+            all_questions,
+            counts,
+            usage_history,
+            rng=rng,
+            weights=weights,
+            exclude=excluded,
+        )
+    elif rng is None:
+        pool = get_paper_pool(
+            all_questions,
+            counts,
+            PAPER_POOL_SIZE,
+            weights=lambda: selection_weights(all_questions),
+        )
+        paper = pool.take(usage_history)
+    else:
+        paper = generate_paper(
+            all_questions,
+            counts,
+            usage_history,
+            rng=rng,
+            weights=selection_weights(all_questions),
         )
-        for q in lr_qs:
-            q["category"] = "Logical Reasoning"
-        selected.extend(lr_qs)
 
-    # Update persistent usage history with newly selected questions
-    new_ids = [get_question_id(q) for q in selected]
+    # Update persistent usage history with newly selected questions, section
+    # by section as they were drawn (the paper itself is shuffled)
+    section_order = {category: rank for rank, category in enumerate(SECTIONS)}
+    drawn = sorted(
+        paper, key=lambda index: section_order[all_questions.locate(index)[0]]
+    )
+    new_ids = [all_questions.id_of(index) for index in drawn]
     updated_history = new_ids + usage_history
-    # Save to file (persists across page reloads)
+    # Save to the store (persists across page reloads and restarts)
     save_question_usage(updated_history[:MAX_USAGE_HISTORY])
 
-    random.shuffle(selected)
-    return selected
+    return paper
+
+
+def paper_question(i):
+    """Returns (rendered question, section name) for position ``i`` of the paper."""
+    bank = st.session_state.bank
+    index = st.session_state.paper[i]
+    category = bank.locate(index)[0]
+    return bank.rendered[index], SECTIONS.get(category, ("General",))[0]
 
 
 def initialize_session_state():
-    """Initializes session state variables."""
+    """Initializes session state variables.
+
+    An exam is kept compact: the paper is an ``array('I')`` of indices into the
+    shared ``bank``, ``user_answers`` a bytearray of chosen option index + 1
+    (0 = unanswered) and ``time_spent`` an ``array('d')`` of seconds.
+    """
     if "exam_started" not in st.session_state:
         st.session_state.exam_started = False
     if "start_time" not in st.session_state:
         st.session_state.start_time = None
-    if "questions" not in st.session_state:
-        st.session_state.questions = []
+    if "bank" not in st.session_state:
+        st.session_state.bank = None  # Pinned until the exam ends, even if reloaded
+    if "paper" not in st.session_state:
+        st.session_state.paper = array("I")
     if "user_answers" not in st.session_state:
-        st.session_state.user_answers = {}
+        st.session_state.user_answers = bytearray()
     if "time_spent" not in st.session_state:
-        st.session_state.time_spent = {}  # Map question index to total seconds
+        st.session_state.time_spent = array("d")  # Total seconds per question
     if "current_q_index" not in st.session_state:
         st.session_state.current_q_index = 0
     if "q_start_time" not in st.session_state:
@@ -307,360 +218,629 @@ def update_time_spent():
     if st.session_state.q_start_time is not None:
         elapsed = time.time() - st.session_state.q_start_time
         idx = st.session_state.current_q_index
-        st.session_state.time_spent[idx] = (
-            st.session_state.time_spent.get(idx, 0) + elapsed
+        st.session_state.time_spent[idx] += elapsed
+        get_checkpoint_store().record_time(
+            get_browser_token(), idx, st.session_state.time_spent[idx]
         )
 
 
 def navigate_to(index):
-    """Navigates to the specific question index."""
+    """Navigates to the specific question index (an ``on_click`` callback)."""
     update_time_spent()  # Save time for current question
     st.session_state.current_q_index = index
     st.session_state.q_start_time = time.time()  # Reset start time for new question
-    st.rerun()
+    get_checkpoint_store().record_position(get_browser_token(), index)
+    # Callbacks can't rerun; the fragment that was clicked does it first thing
+    st.session_state.navigated = True
+
+
+def rerun_if_navigated():
+    """Promotes a fragment rerun caused by navigation to a full page rerun."""
+    if st.session_state.pop("navigated", False):
+        st.rerun()
 
 
 def start_exam():
     all_qs = load_questions()
     if all_qs:
-        st.session_state.questions = select_questions(all_qs)
+        try:
+            paper = select_questions(
+                all_qs,
+                require=st.session_state.get("require_topics", "").strip(),
+                exclude=st.session_state.get("exclude_topics", "").strip(),
+            )
+        except ValueError as e:
+            st.error(f"Invalid topic filter: {e}")
+            return
+        if not paper:
+            st.error("No questions are left after the topic filters.")
+            return
+        st.session_state.bank = all_qs
+        st.session_state.paper = paper
         st.session_state.exam_started = True
         st.session_state.start_time = time.time()
         st.session_state.submitted = False
-        st.session_state.user_answers = {}
-        st.session_state.time_spent = {}
+        st.session_state.user_answers = bytearray(len(paper))
+        st.session_state.time_spent = array("d", [0.0]) * len(paper)
         st.session_state.current_q_index = 0
         st.session_state.q_start_time = time.time()
+        get_checkpoint_store().start(
+            get_browser_token(),
+            all_qs.version,
+            [all_qs.id_of(index) for index in paper],
+            st.session_state.start_time + TOTAL_TIME_MINUTES * 60,
+        )
         st.rerun()
 
 
+def resume_exam():
+    """Restores this browser's unfinished exam from its checkpoint.
+
+    Questions that have since left the bank are dropped. The clock keeps
+    running from the original deadline, so an exam whose time ran out while
+    the browser was away is submitted on the next timer tick. Returns True
+    if an exam was restored.
+    """
+    token = get_browser_token()
+    store = get_checkpoint_store()
+    checkpoint = store.load(token)
+    if checkpoint is None:
+        return False
+    all_qs = load_questions()
+    if not all_qs:
+        return False
+
+    paper = array("I")
+    slots = []
+    for slot, q_id in enumerate(checkpoint.question_ids):
+        located = all_qs.index.get(q_id)
+        if located is not None:
+            category, position = located
+            paper.append(all_qs.offsets[category] + position)
+            slots.append(slot)
+    if not paper:
+        store.finish(token)
+        return False
+
+    answers = bytearray(checkpoint.answers.get(slot, 0) for slot in slots)
+    times = array("d", (checkpoint.times.get(slot, 0.0) for slot in slots))
+    current = slots.index(checkpoint.current) if checkpoint.current in slots else 0
+    if len(slots) < len(checkpoint.question_ids):
+        # Renumber the checkpoint to match the shortened paper
+        store.start(
+            token,
+            all_qs.version,
+            [all_qs.id_of(index) for index in paper],
+            checkpoint.deadline,
+        )
+        for i in range(len(paper)):
+            if answers[i]:
+                store.record_answer(token, i, answers[i])
+            if times[i]:
+                store.record_time(token, i, times[i])
+        store.record_position(token, current)
+
+    st.session_state.bank = all_qs
+    st.session_state.paper = paper
+    st.session_state.exam_started = True
+    st.session_state.start_time = checkpoint.deadline - TOTAL_TIME_MINUTES * 60
+    st.session_state.submitted = False
+    st.session_state.user_answers = answers
+    st.session_state.time_spent = times
+    st.session_state.current_q_index = current
+    st.session_state.q_start_time = time.time()
+    return True
+
+
+@instrumentation.timed("get_score_report")
+def get_score_report():
+    """Scores the submitted paper once; reruns of the results page reuse it."""
+    if st.session_state.get("score_report") is None:
+        answers, sections = answer_key(
+            st.session_state.bank, st.session_state.paper, list(SECTIONS)
+        )
+        st.session_state.score_report = score_submission(
+            st.session_state.user_answers,
+            answers,
+            sections,
+            st.session_state.time_spent,
+            len(SECTIONS),
+            MARKING_SCHEME,
+        )
+        bank = st.session_state.bank
+        ids = [bank.id_of(index) for index in st.session_state.paper]
+        get_item_stats().record_submission(
+            ids,
+            st.session_state.score_report.outcomes,
+            st.session_state.time_spent,
+        )
+        get_results_log().record(
+            bank.version,
+            ids,
+            st.session_state.user_answers,
+            st.session_state.time_spent,
+            st.session_state.score_report,
+            [name for name, _ in SECTIONS.values()],
+        )
+    return st.session_state.score_report
+
+
 def submit_exam():
     update_time_spent()  # Final time capture
+    get_checkpoint_store().finish(get_browser_token())
+    st.session_state.score_report = None
     st.session_state.submitted = True
     st.session_state.exam_started = False
     st.rerun()
 
 
-def get_timer_html(remaining_seconds):
-    """Generates HTML/JS for the sidebar timer."""
-    timer_id = f"timer_{int(time.time())}"
-
-    js_code = f"""
-    <div id="{timer_id}" class="timer-box">
-        Loading...
-    </div>
-    <script>
-        (function() {{
-            var timeLeft = {int(remaining_seconds)};
-            var timerElement = document.getElementById("{timer_id}");
-            
-            var countdown = setInterval(function() {{
-                if (timeLeft <= 0) {{
-                    clearInterval(countdown);
-                    timerElement.innerHTML = "Time's Up!";
-                }} else {{
-                    var mins = Math.floor(timeLeft / 60);
-                    var seconds = timeLeft % 60;
-                    timerElement.innerHTML = mins.toString().padStart(2, '0') + ":" + seconds.toString().padStart(2, '0');
-                    timeLeft -= 1;
-                }}
-            }}, 1000);
-        }})();
-    </script>
-    """
-    return js_code
+# --- Instrumentation ---
+@contextlib.contextmanager
+def rerun_scope(name):
+    """Profiles (with ``?profile=``) and times one rerun as the ``name`` span."""
+    with instrumentation.rerun_scope(st.session_state, name) as profiled:
+        if profiled is False and not st.session_state.get("profile_busy_shown"):
+            st.session_state.profile_busy_shown = True
+            st.toast("Profiling busy: another session is being profiled right now.")
+        yield
 
 
-# --- Main App ---
-st.set_page_config(
-    page_title="Mock Test App",
-    page_icon="📝",
-    layout="wide",
-    initial_sidebar_state="expanded",
-)
-local_css()
-initialize_session_state()
-
-# --- Header ---
-if not st.session_state.exam_started and not st.session_state.submitted:
-    st.markdown(
-        "<h1 style='text-align: center; color: #4F8BF9;'>Mock Test Application</h1>",
-        unsafe_allow_html=True,
-    )
-    st.markdown(
-        "<h3 style='text-align: center;'>MCA Entrance Preparation</h3>",
-        unsafe_allow_html=True,
-    )
-else:
-    st.title("Mock Test Application")
+def fragment_rerun(func):
+    """Gives a fragment's own reruns the page's profiling and a timing span.
 
+    Fragment reruns skip ``main()``, so without this the ``rerun`` span and
+    the session profile would miss answering, the palette and the timer.
+    """
 
-# --- Exam Phase ---
-if st.session_state.exam_started and not st.session_state.submitted:
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with rerun_scope("fragment_rerun"):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+@st.fragment
+@fragment_rerun
+@instrumentation.timed("timer_panel")
+def timer_panel():
+    """Sidebar timer; submits the exam when it runs out."""
+    rerun_if_navigated()
+    deadline = st.session_state.start_time + TOTAL_TIME_MINUTES * 60
+    if exam_timer(deadline):
+        st.warning("Time is up!")
+        submit_exam()
+
+
+@st.fragment
+@fragment_rerun
+@instrumentation.timed("question_palette")
+def question_palette():
+    """Grid of buttons jumping to each question."""
+    rerun_if_navigated()
+    q_count = len(st.session_state.paper)
+
+    # Pagination for palette if too many questions? No, single grid is better for overview
+    with st.container(height=400):
+        cols = st.columns(5)  # 5 columns for buttons
+        for i in range(q_count):
+            with cols[i % 5]:
+                is_current = i == st.session_state.current_q_index
+                is_answered = st.session_state.user_answers[i] != 0
+
+                label = f"{i+1}"
+                btn_type = (
+                    "primary"
+                    if is_current
+                    else ("secondary" if not is_answered else "secondary")
+                )
 
-    # --- Sidebar ---
-    with st.sidebar:
-        st.markdown("### ⏳ Timer")
-        # 1. Timer
-        elapsed_global = time.time() - st.session_state.start_time
-        remaining_seconds = max(0, (TOTAL_TIME_MINUTES * 60) - elapsed_global)
+                # Style hack: If answered, maybe bold? Streamlit buttons are limited.
+                # We rely on 'primary' for current focus.
 
-        if remaining_seconds <= 0:
-            st.warning("Time is up!")
-            submit_exam()
-        else:
-            components.html(get_timer_html(remaining_seconds), height=80)
+                st.button(
+                    label,
+                    key=f"nav_{i}",
+                    type=btn_type,
+                    use_container_width=True,
+                    on_click=navigate_to,
+                    args=(i,),
+                )
 
-        st.markdown("---")
 
-        # 2. Question Palette
-        st.markdown("### 🧭 Navigation")
+@st.fragment
+@fragment_rerun
+@instrumentation.timed("question_pane")
+def question_pane():
+    """Progress bar, current question, answer options and Previous/Next."""
+    rerun_if_navigated()
+    if not 0 <= st.session_state.current_q_index < len(st.session_state.paper):
+        st.error("Invalid question index.")
+        return
 
-        q_count = len(st.session_state.questions)
+    idx = st.session_state.current_q_index
+    q, category = paper_question(idx)
 
-        # Pagination for palette if too many questions? No, single grid is better for overview
-        with st.container(height=400):
-            cols = st.columns(5)  # 5 columns for buttons
-            for i in range(q_count):
-                with cols[i % 5]:
-                    is_current = i == st.session_state.current_q_index
-                    is_answered = i in st.session_state.user_answers
+    # Progress Bar
+    q_count = len(st.session_state.paper)
+    answered = q_count - st.session_state.user_answers.count(0)
+    st.progress(
+        answered / q_count,
+        text=f"Progress: {answered}/{q_count} answered",
+    )
 
-                    label = f"{i+1}"
-                    btn_type = (
-                        "primary"
-                        if is_current
-                        else ("secondary" if not is_answered else "secondary")
-                    )
+    # Question Container
+    with st.container():
+        st.markdown(
+            f"""
+        <div class="question-card">
+            <span class="category-tag">{category}</span>
+        </div>
+        """,
+            unsafe_allow_html=True,
+        )
 
-                    # Style hack: If answered, maybe bold? Streamlit buttons are limited.
-                    # We rely on 'primary' for current focus.
+        # Render question with LaTeX support
+        st.markdown(f"### Q{idx+1}. {q.question}")
 
-                    if st.button(
-                        label, key=f"nav_{i}", type=btn_type, use_container_width=True
-                    ):
-                        navigate_to(i)
+    # Answer Selection (stored as option index + 1, 0 = unanswered)
+    current_answer = st.session_state.user_answers[idx]
+    options = q.options
 
-        st.markdown("---")
-        if st.button("🚩 Submit Exam", type="primary", use_container_width=True):
-            submit_exam()
-
-    # --- Main Content ---
-    if 0 <= st.session_state.current_q_index < len(st.session_state.questions):
-        idx = st.session_state.current_q_index
-        q = st.session_state.questions[idx]
+    selected_option = st.radio(
+        "Select an answer:",
+        range(len(options)),
+        format_func=options.__getitem__,
+        index=current_answer - 1 if current_answer else None,
+        key=f"radio_{idx}",
+        label_visibility="collapsed",
+    )
 
-        # Progress Bar
-        progress = len(st.session_state.user_answers) / len(st.session_state.questions)
-        st.progress(
-            progress,
-            text=f"Progress: {len(st.session_state.user_answers)}/{len(st.session_state.questions)} answered",
+    if selected_option is not None and selected_option + 1 != current_answer:
+        st.session_state.user_answers[idx] = selected_option + 1
+        get_checkpoint_store().record_answer(
+            get_browser_token(), idx, selected_option + 1
         )
 
-        # Question Container
-        with st.container():
-            st.markdown(
-                f"""
-            <div class="question-card">
-                <span class="category-tag">{q.get('category', 'General')}</span>
-            </div>
-            """,
-                unsafe_allow_html=True,
+    st.markdown("---")
+
+    # Navigation Buttons (Bottom)
+    col_prev, col_spacer, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if idx > 0:
+            st.button(
+                "⬅ Previous",
+                use_container_width=True,
+                on_click=navigate_to,
+                args=(idx - 1,),
             )
+    with col_next:
+        if idx < q_count - 1:
+            st.button(
+                "Next ➡",
+                use_container_width=True,
+                on_click=navigate_to,
+                args=(idx + 1,),
+            )
+
 
-            # Render question with LaTeX support
-            st.markdown(f"### Q{idx+1}. {q['question']}")
-
-        # Answer Selection
-        current_answer = st.session_state.user_answers.get(idx, None)
-
-        selected_option = st.radio(
-            "Select an answer:",
-            q["options"],
-            index=(
-                q["options"].index(current_answer)
-                if current_answer in q["options"]
-                else None
-            ),
-            key=f"radio_{idx}",
-            label_visibility="collapsed",
+# --- Admin ---
+def admin_page():
+    """Admin views (``?admin=<MOCKOUT_ADMIN_TOKEN>``)."""
+    metrics_tab, search_tab, cohort_tab = st.tabs(
+        ["Instrumentation", "Question Search", "Cohort Dashboard"]
+    )
+    with metrics_tab:
+        metrics_panel()
+    with search_tab:
+        search_panel()
+    with cohort_tab:
+        cohort_panel()
+
+
+def metrics_panel():
+    """Timing histograms of this server process."""
+    if not instrumentation.ENABLED:
+        st.info("Instrumentation is off; start the server with MOCKOUT_METRICS=1.")
+    rows = instrumentation.summary()
+    if rows:
+        st.dataframe(rows, hide_index=True)
+    text = instrumentation.prometheus_text()
+    st.download_button(
+        "Download Prometheus metrics", text, file_name="mockout.prom", mime="text/plain"
+    )
+    with st.expander("Prometheus text"):
+        st.code(text, language=None)
+    st.caption(
+        "Add `?profile=<admin token>` to a candidate's URL to record cProfile "
+        f"output for that session under `{instrumentation.PROFILE_DIR}/`."
+    )
+
+
+def search_panel():
+    """Boolean/prefix search over the question bank's inverted index."""
+    bank = load_questions()
+    if bank is None:
+        return
+    query = st.text_input(
+        "Search questions",
+        placeholder="e.g. (cache OR tlb) -category:math, addr*, tag:number-series",
+    )
+    if not query.strip():
+        st.caption(f"{len(bank.search)} terms indexed over {bank.search.size} questions.")
+        return
+    started = time.perf_counter()
+    try:
+        matches = bank.search.search(query)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    elapsed = (time.perf_counter() - started) * 1000
+    st.caption(f"{len(matches)} matching questions ({elapsed:.1f} ms)")
+    rows = []
+    for index in matches[:200].tolist():
+        category, position = bank.locate(index)
+        question = bank[category][position]
+        rows.append(
+            {
+                "category": category,
+                "id": bank.id_of(index),
+                "question": question["question"],
+                "tags": ", ".join(question.get("tags", ())),
+            }
         )
+    st.dataframe(rows, hide_index=True)
+    if len(matches) > len(rows):
+        st.caption(f"Showing the first {len(rows)}.")
 
-        if selected_option:
-            st.session_state.user_answers[idx] = selected_option
 
-        st.markdown("---")
+def cohort_panel():
+    """Score distribution, section averages and hardest questions of all candidates.
+
+    Totals are kept by ``results_log.CohortAggregates``; each refresh only
+    reads the log files written since the previous one.
+    """
+    aggregates = results_log.get_cohort_aggregates(RESULTS_DIR)
+    if st.button("Write pending results now"):
+        get_results_log().flush()
+    started = time.perf_counter()
+    new_files = aggregates.refresh()
+    elapsed = (time.perf_counter() - started) * 1000
+    st.caption(
+        f"{aggregates.file_count} log files under `{RESULTS_DIR}/`, "
+        f"{new_files} new ({elapsed:.1f} ms). Results are written in batches, "
+        "so the latest submissions can take a minute to appear."
+    )
+    if not aggregates.submissions:
+        st.info("No submissions logged yet.")
+        return
+
+    distribution = aggregates.score_distribution()
+    total = sum(score * count for score, count in distribution)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Submissions", aggregates.submissions)
+    col2.metric("Average score", f"{total / aggregates.submissions:.1f}")
+    col3.metric("Answered questions", aggregates.answered_items())
+
+    st.markdown("#### Score distribution")
+    st.bar_chart(
+        {
+            "score": [score for score, _ in distribution],
+            "candidates": [count for _, count in distribution],
+        },
+        x="score",
+        y="candidates",
+    )
 
-        # Navigation Buttons (Bottom)
-        col_prev, col_spacer, col_next = st.columns([1, 2, 1])
-        with col_prev:
-            if idx > 0:
-                if st.button("⬅ Previous", use_container_width=True):
-                    navigate_to(idx - 1)
-        with col_next:
-            if idx < len(st.session_state.questions) - 1:
-                if st.button("Next ➡", use_container_width=True):
-                    navigate_to(idx + 1)
+    st.markdown("#### Section averages")
+    st.dataframe(aggregates.section_averages(), hide_index=True)
+
+    st.markdown("#### Hardest questions")
+    min_answered = st.number_input("Minimum answers", min_value=1, value=20)
+    rows = aggregates.hardest_questions(min_answered=min_answered)
+    bank = load_questions()
+    if bank is not None:
+        for row in rows:
+            found = bank.index.get(row["id"])
+            if found is not None:
+                category, position = found
+                row["question"] = bank[category][position]["question"]
+    st.dataframe(rows, hide_index=True)
+
+    st.markdown("#### Submissions per day")
+    days = sorted(aggregates.days.items())
+    st.bar_chart(
+        {"day": [day for day, _ in days], "submissions": [n for _, n in days]},
+        x="day",
+        y="submissions",
+    )
+
+
+# --- Main App ---
+def main():
+    st.set_page_config(
+        page_title="Mock Test App",
+        page_icon="📝",
+        layout="wide",
+        initial_sidebar_state="expanded",
+    )
+    local_css()
+    if instrumentation.is_admin(st.query_params.get("admin", "")):
+        admin_page()
+        return
+    initialize_session_state()
+
+    # A reload or a restarted server picks up where this browser left off
+    if "resume_checked" not in st.session_state:
+        st.session_state.resume_checked = True
+        if not st.session_state.exam_started and resume_exam():
+            st.toast("Welcome back! Your exam has been restored.")
+
+    # --- Header ---
+    if not st.session_state.exam_started and not st.session_state.submitted:
+        st.markdown(
+            "<h1 style='text-align: center; color: #4F8BF9;'>Mock Test Application</h1>",
+            unsafe_allow_html=True,
+        )
+        st.markdown(
+            "<h3 style='text-align: center;'>MCA Entrance Preparation</h3>",
+            unsafe_allow_html=True,
+        )
     else:
-        st.error("Invalid question index.")
+        st.title("Mock Test Application")
 
-# --- Results Phase ---
-elif st.session_state.submitted:
-    st.balloons()
-    st.success("Exam Submitted Successfully!")
-
-    score = 0
-    total = len(st.session_state.questions)
-
-    # Initialize counters for each section
-    sections = ["Computer Science", "Mathematics", "Logical Reasoning"]
-    stats = {
-        sec: {"correct": 0, "wrong": 0, "unattempted": 0, "score": 0, "time": 0.0}
-        for sec in sections
-    }
-    total_score = 0
-    total_correct = 0
-    total_wrong = 0
-    total_unattempted = 0
-
-    # Calculate stats
-    for i, q in enumerate(st.session_state.questions):
-        user_ans = st.session_state.user_answers.get(i)
-        correct_ans = q["answer"]
-        category = q.get("category", "General")
-        time_spent = st.session_state.time_spent.get(i, 0)
-
-        if category in stats:
-            stats[category]["time"] += time_spent
-
-        if user_ans is None:
-            total_unattempted += 1
-            if category in stats:
-                stats[category]["unattempted"] += 1
-        elif user_ans == correct_ans:
-            total_correct += 1
-            if category in stats:
-                stats[category]["correct"] += 1
-            mark = 4
-            total_score += mark
-            if category in stats:
-                stats[category]["score"] += mark
-        else:
-            total_wrong += 1
-            if category in stats:
-                stats[category]["wrong"] += 1
-            mark = -1
-            total_score += mark
-            if category in stats:
-                stats[category]["score"] += mark
-
-    # Display Overall Summary
-    st.markdown("## 📊 Performance Analysis")
+    # --- Exam Phase ---
+    if st.session_state.exam_started and not st.session_state.submitted:
 
-    with st.container():
-        c1, c2, c3, c4 = st.columns(4)
-        c1.metric("Total Score", f"{total_score}", delta=None)
-        c2.metric("Total Correct", total_correct, delta_color="normal")
-        c3.metric("Total Wrong", total_wrong, delta_color="inverse")
-        c4.metric("Total Unattempted", total_unattempted, delta_color="off")
+        # Each panel is a fragment: answering a question only reruns the question
+        # pane; navigating changes both the palette and the pane, so it reruns the
+        # page once (see navigate_to).
+        with st.sidebar:
+            st.markdown("### ⏳ Timer")
+            timer_panel()
 
-    st.markdown("---")
+            st.markdown("---")
 
-    # Display Section-wise Stats
-    st.markdown("### 📑 Section-wise Breakdown")
+            st.markdown("### 🧭 Navigation")
+            question_palette()
 
-    for sec in sections:
-        with st.container():
-            st.markdown(f"**{sec}**")
-            sc1, sc2, sc3, sc4, sc5 = st.columns(5)
-            s_data = stats[sec]
-
-            sc1.metric("Score", s_data["score"])
-            sc2.metric("Correct", s_data["correct"], delta_color="normal")
-            sc3.metric("Wrong", s_data["wrong"], delta_color="inverse")
-            sc4.metric("Unattempted", s_data["unattempted"], delta_color="off")
-            sc5.metric(
-                "Avg Time",
-                f"{(s_data['time'] / max(1, (s_data['correct'] + s_data['wrong'] + s_data['unattempted']))):.1f}s",
-            )
-            st.divider()
+            st.markdown("---")
+            if st.button("🚩 Submit Exam", type="primary", use_container_width=True):
+                submit_exam()
 
-    # Detailed Analysis
-    with st.expander("Show Detailed Question Analysis"):
-        for i, q in enumerate(st.session_state.questions):
-            user_ans = st.session_state.user_answers.get(i)
-            correct_ans = q["answer"]
-            time_spent = st.session_state.time_spent.get(i, 0)
+        question_pane()
 
-            is_correct = user_ans == correct_ans
-            icon = "✅" if is_correct else "❌"
+    # --- Results Phase ---
+    elif st.session_state.submitted:
+        st.balloons()
+        st.success("Exam Submitted Successfully!")
 
-            st.markdown(f"**Q{i+1}: {q['question']}** {icon}")
+        report = get_score_report()
+        total = len(st.session_state.paper)
 
-            c1, c2 = st.columns(2)
-            with c1:
-                st.markdown(
-                    f"- **Your Answer:** {user_ans if user_ans else 'No Answer'}"
-                )
-                st.markdown(f"- **Correct Answer:** {correct_ans}")
-            with c2:
-                st.markdown(f"- **Time Spent:** {time_spent:.1f}s")
-                st.caption(f"Category: {q.get('category')}")
-            st.divider()
-
-    if st.button("🔄 Retake Exam", type="primary"):
-        # Clear session state (usage history persists in browser localStorage)
-        for key in list(st.session_state.keys()):
-            del st.session_state[key]
-        st.rerun()
+        # Display Overall Summary
+        st.markdown("## 📊 Performance Analysis")
 
-# --- Start Screen ---
-else:
-    # Initialize usage history from browser on app start
-    init_usage_from_browser()
+        with st.container():
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Total Score", f"{report.score}", delta=None)
+            c2.metric("Total Correct", report.correct, delta_color="normal")
+            c3.metric("Total Wrong", report.wrong, delta_color="inverse")
+            c4.metric("Total Unattempted", report.unattempted, delta_color="off")
 
-    with st.container():
-        c1, c2, c3 = st.columns([1, 2, 1])
-        with c2:
-            st.image(
-                "https://streamlit.io/images/brand/streamlit-mark-color.png", width=100
-            )  # Placeholder logo
-            st.markdown("## Instructions")
-            st.info(
-                f"""
-            - **Duration:** {TOTAL_TIME_MINUTES} Minutes
-            - **Total Questions:** {CS_COUNT + MATH_COUNT + LR_COUNT}
-            - **Marking Scheme:** +4 for Correct, -1 for Incorrect
-            """
-            )
+        st.markdown("---")
 
-            # Show question usage tracking status
-            usage_history = st.session_state.get("usage_history_cache", [])
-            if len(usage_history) > 0:
-                st.success(
+        # Display Section-wise Stats
+        st.markdown("### 📑 Section-wise Breakdown")
+
+        for (sec, _), s_data in zip(SECTIONS.values(), report.sections):
+            with st.container():
+                st.markdown(f"**{sec}**")
+                sc1, sc2, sc3, sc4, sc5 = st.columns(5)
+
+                sc1.metric("Score", s_data.score)
+                sc2.metric("Correct", s_data.correct, delta_color="normal")
+                sc3.metric("Wrong", s_data.wrong, delta_color="inverse")
+                sc4.metric("Unattempted", s_data.unattempted, delta_color="off")
+                sc5.metric("Avg Time", f"{s_data.avg_time:.1f}s")
+                st.divider()
+
+        # Detailed Analysis
+        with st.expander("Show Detailed Question Analysis"):
+            for i in range(total):
+                q, category = paper_question(i)
+                choice = st.session_state.user_answers[i]
+                user_ans = q.options[choice - 1] if choice else None
+                correct_ans = q.answer
+                time_spent = st.session_state.time_spent[i]
+
+                icon = "✅" if report.outcomes[i] == 1 else "❌"
+
+                st.markdown(f"**Q{i+1}: {q.question}** {icon}")
+
+                c1, c2 = st.columns(2)
+                with c1:
+                    st.markdown(
+                        f"- **Your Answer:** {user_ans if user_ans else 'No Answer'}"
+                    )
+                    st.markdown(f"- **Correct Answer:** {correct_ans}")
+                with c2:
+                    st.markdown(f"- **Time Spent:** {time_spent:.1f}s")
+                    st.caption(f"Category: {category}")
+                st.divider()
+
+        if st.button("🔄 Retake Exam", type="primary"):
+            # Clear session state (usage history persists in the usage store)
+            for key in list(st.session_state.keys()):
+                del st.session_state[key]
+            st.rerun()
+
+    # --- Start Screen ---
+    else:
+        with st.container():
+            c1, c2, c3 = st.columns([1, 2, 1])
+            with c2:
+                st.image(
+                    "https://streamlit.io/images/brand/streamlit-mark-color.png", width=100
+                )  # Placeholder logo
+                st.markdown("## Instructions")
+                st.info(
                     f"""
-                🎯 **Smart Randomization Active**  
-                Tracking {len(usage_history)} recently used questions.  
-                Recent questions will have lower probability (saved in browser).
+                - **Duration:** {TOTAL_TIME_MINUTES} Minutes
+                - **Total Questions:** {CS_COUNT + MATH_COUNT + LR_COUNT}
+                - **Marking Scheme:** +{MARKING_SCHEME.correct} for Correct, {MARKING_SCHEME.wrong} for Incorrect
                 """
                 )
 
-            # Add button to clear history
-            if st.button(
-                "🗑️ Clear Question History",
-                help="Reset question tracking to get a completely fresh randomization",
-            ):
-                clear_usage_history()
-                st.success("Question history cleared!")
-                st.rerun()
-
-            st.markdown("### Subject Distribution")
-            col_a, col_b, col_c = st.columns(3)
-            col_a.metric("Computer Science", CS_COUNT)
-            col_b.metric("Mathematics", MATH_COUNT)
-            col_c.metric("Logical Reasoning", LR_COUNT)
-
-            st.markdown("<br>", unsafe_allow_html=True)
-
-            if st.button("🚀 Start Exam", type="primary", use_container_width=True):
-                start_exam()
+                # Show question usage tracking status
+                usage_history = load_question_usage()
+                if len(usage_history) > 0:
+                    st.success(
+                        f"""
+                    🎯 **Smart Randomization Active**  
+                    Tracking {len(usage_history)} recently used questions.  
+                    Recent questions will have lower probability (saved for this browser link).
+                    """
+                    )
+
+                # Add button to clear history
+                if st.button(
+                    "🗑️ Clear Question History",
+                    help="Reset question tracking to get a completely fresh randomization",
+                ):
+                    clear_usage_history()
+                    st.success("Question history cleared!")
+                    st.rerun()
+
+                st.markdown("### Subject Distribution")
+                col_a, col_b, col_c = st.columns(3)
+                col_a.metric("Computer Science", CS_COUNT)
+                col_b.metric("Mathematics", MATH_COUNT)
+                col_c.metric("Logical Reasoning", LR_COUNT)
+
+                with st.expander("🔎 Topic Focus (optional)"):
+                    st.text_input(
+                        "Prefer questions about",
+                        key="require_topics",
+                        placeholder="e.g. cache OR paging",
+                        help="Sections are filled from matching questions first. "
+                        "Terms are ANDed; use OR, -term, prefix* and "
+                        "tag:name / category:name.",
+                    )
+                    st.text_input(
+                        "Leave out questions about",
+                        key="exclude_topics",
+                        placeholder="e.g. tag:number-series",
+                    )
+
+                st.markdown("<br>", unsafe_allow_html=True)
+
+                if st.button("🚀 Start Exam", type="primary", use_container_width=True):
+                    start_exam()
+
+
+if instrumentation.is_admin(st.query_params.get("profile", "")):
+    instrumentation.start_profiling(st.session_state)
+
+with rerun_scope("rerun"):
+    main()
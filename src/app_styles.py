@@ -0,0 +1,26 @@
+import hashlib
+import os
+
+import streamlit.components.v1 as components
+
+import instrumentation
+
+_COMPONENT_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "components", "app_styles"
+)
+_styles = components.declare_component("app_styles", path=_COMPONENT_DIR)
+
+# Changes with the stylesheet's content, so browsers never keep a stale copy
+with open(os.path.join(_COMPONENT_DIR, "style.css"), "rb") as f:
+    STYLE_VERSION = hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+@instrumentation.timed("app_styles")
+def app_styles(key="app_styles"):
+    """Links the app stylesheet (``components/app_styles/style.css``) into the page.
+
+    The browser downloads the file once per version and caches it. Each rerun
+    only sends this small element in place of the whole ``<style>`` block, and
+    the zero-height iframe is mounted once and kept across reruns.
+    """
+    _styles(version=STYLE_VERSION, key=key, default=None)
@@ -0,0 +1,460 @@
+import bisect
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from collections.abc import Mapping, Sequence
+from functools import cached_property
+from types import MappingProxyType
+
+import yaml
+
+from dedup import build_index
+from render import RenderCache
+from search import SearchIndex
+
+# Prefer the libyaml-backed loader when PyYAML was built with it
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# --- Process-wide cache ---
+# Maps absolute path -> (stat key, content digest, bank)
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+# --- Compiled bank format ---
+# Little-endian; every section offset follows from the header counts:
+#   header | categories | questions | option refs | string offsets | string blob
+COMPILED_SUFFIX = ".qbank"
+_MAGIC = b"MOQB"
+_FORMAT_VERSION = 2
+# magic, format version, reserved, source mtime_ns, source size, source sha256,
+# string count, category count, question count, option ref count
+_HEADER = struct.Struct("<4sHHqq32sIIII")
+# name sid, first question, question count
+_CATEGORY = struct.Struct("<III")
+# question id, question sid, answer sid, first option ref, option count, tag
+# count; a question's tag refs follow its option refs
+_QUESTION = struct.Struct("<8sIIIHH")
+_U32 = struct.Struct("<I")
+
+
+def _as_text(value):
+    """YAML turns bare numbers into int/float; the bank stores everything as text."""
+    return value if isinstance(value, str) else str(value)
+
+
+def _as_tags(value):
+    """Optional ``tags`` of a question: a list, or one tag as a plain string."""
+    if not value:
+        return ()
+    if isinstance(value, (list, tuple)):
+        return tuple(_as_text(tag) for tag in value)
+    return (_as_text(value),)
+
+
+def question_id(question):
+    """Stable content hash of a question's text and options (16 hex chars)."""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(_as_text(question.get("question", "")).encode("utf-8"))
+    for opt in question.get("options") or ():
+        digest.update(b"\x1f")
+        digest.update(_as_text(opt).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _freeze_question(question):
+    """Returns a read-only copy of a question dict."""
+    frozen = dict(question)
+    frozen["question"] = _as_text(question.get("question", ""))
+    frozen["options"] = tuple(_as_text(opt) for opt in question.get("options") or ())
+    frozen["answer"] = _as_text(question.get("answer", ""))
+    frozen["tags"] = _as_tags(question.get("tags"))
+    frozen["id"] = question_id(frozen)
+    return MappingProxyType(frozen)
+
+
+class _Bank(Mapping):
+    """Shared read-only behaviour of the YAML and compiled banks.
+
+    Subclasses fill ``_categories`` (name -> sequence of question mappings)
+    and implement ``_category_ids``.
+    """
+
+    def __getitem__(self, category):
+        return self._categories[category]
+
+    def __iter__(self):
+        return iter(self._categories)
+
+    def __len__(self):
+        return len(self._categories)
+
+    def __repr__(self):
+        sizes = ", ".join(f"{cat}={len(qs)}" for cat, qs in self._categories.items())
+        return f"{type(self).__name__}({sizes}, version={self.version!r})"
+
+    def ids(self, category):
+        """Question IDs of a category, in bank order (computed once)."""
+        ids = self._ids.get(category)
+        if ids is None:
+            ids = self._ids[category] = self._category_ids(category)
+        return ids
+
+    @cached_property
+    def index(self):
+        """Maps question ID -> (category, position). Identical questions share the first."""
+        index = {}
+        for category in self._categories:
+            for position, q_id in enumerate(self.ids(category)):
+                index.setdefault(q_id, (category, position))
+        return MappingProxyType(index)
+
+    @cached_property
+    def duplicates(self):
+        """Near-duplicate index over the bank, by flat index (built on first use)."""
+        return build_index(self)
+
+    @cached_property
+    def rendered(self):
+        """Display-ready Markdown of each question, by flat index (rendered lazily)."""
+        return RenderCache(self)
+
+    @cached_property
+    def search(self):
+        """Inverted index for topic queries, by flat index (built on first use)."""
+        return SearchIndex(self)
+
+    # Questions are also numbered 0..N-1 across categories, in bank order, so
+    # sessions and papers can refer to them with a compact array of ints.
+
+    @cached_property
+    def offsets(self):
+        """Maps category -> flat index of its first question."""
+        offsets = {}
+        total = 0
+        for category, questions in self._categories.items():
+            offsets[category] = total
+            total += len(questions)
+        return MappingProxyType(offsets)
+
+    @cached_property
+    def _starts(self):
+        return list(self.offsets.values()), list(self.offsets)
+
+    def locate(self, index):
+        """Returns (category, position) of a flat question index."""
+        starts, categories = self._starts
+        slot = bisect.bisect_right(starts, index) - 1
+        if slot < 0:
+            raise IndexError("question index out of range")
+        category = categories[slot]
+        position = index - starts[slot]
+        if position >= len(self._categories[category]):
+            raise IndexError("question index out of range")
+        return category, position
+
+    def question(self, index):
+        """Returns the question at a flat index."""
+        category, position = self.locate(index)
+        return self._categories[category][position]
+
+    def id_of(self, index):
+        """Returns the ID of the question at a flat index without decoding it."""
+        category, position = self.locate(index)
+        return self.ids(category)[position]
+
+
+class QuestionBank(_Bank):
+    """Immutable question bank shared by every session in the process.
+
+    Behaves like the dict returned by ``yaml.safe_load``: category names map to
+    tuples of read-only question mappings, each carrying its stable ``id``.
+    """
+
+    def __init__(self, data, version=None):
+        categories = {}
+        for category, questions in (data or {}).items():
+            categories[category] = tuple(_freeze_question(q) for q in questions or ())
+        self._categories = MappingProxyType(categories)
+        self._ids = {}
+        self.version = version
+        # IDs are already on every question; build the lookup up front
+        self.index
+
+    def _category_ids(self, category):
+        return tuple(q["id"] for q in self._categories[category])
+
+
+class _CompiledCategory(Sequence):
+    """Lazily decoded view over one category of a compiled bank."""
+
+    def __init__(self, bank, first, count):
+        self._bank = bank
+        self._first = first
+        self._count = count
+        self._decoded = {}
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self[i] for i in range(*index.indices(self._count)))
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("question index out of range")
+        question = self._decoded.get(index)
+        if question is None:
+            question = self._bank._decode_question(self._first + index)
+            self._decoded[index] = question
+        return question
+
+
+class CompiledQuestionBank(_Bank):
+    """Question bank backed by a memory-mapped ``.qbank`` artifact.
+
+    Opening one only touches the header and category table; questions are
+    decoded from the map the first time they are read.
+    """
+
+    def __init__(self, buf):
+        (
+            magic,
+            fmt_version,
+            _reserved,
+            self.source_mtime_ns,
+            self.source_size,
+            self.source_digest,
+            n_strings,
+            n_categories,
+            n_questions,
+            n_option_refs,
+        ) = _HEADER.unpack_from(buf, 0)
+        if magic != _MAGIC or fmt_version != _FORMAT_VERSION:
+            raise ValueError("not a compiled question bank (or an old format)")
+
+        self._buf = buf
+        self._ids = {}
+        self._questions_at = _HEADER.size + n_categories * _CATEGORY.size
+        self._option_refs_at = self._questions_at + n_questions * _QUESTION.size
+        self._string_offsets_at = self._option_refs_at + n_option_refs * _U32.size
+        self._blob_at = self._string_offsets_at + (n_strings + 1) * _U32.size
+        self.version = self.source_digest.hex()
+
+        categories = {}
+        for i in range(n_categories):
+            name_sid, first, count = _CATEGORY.unpack_from(
+                buf, _HEADER.size + i * _CATEGORY.size
+            )
+            categories[self._string(name_sid)] = _CompiledCategory(self, first, count)
+        self._categories = MappingProxyType(categories)
+
+    def _category_ids(self, category):
+        # Only reads the ID column of the question table, no strings
+        view = self._categories[category]
+        return tuple(
+            self._buf[at : at + 8].hex()
+            for at in range(
+                self._questions_at + view._first * _QUESTION.size,
+                self._questions_at + (view._first + len(view)) * _QUESTION.size,
+                _QUESTION.size,
+            )
+        )
+
+    def _string(self, sid):
+        start, end = struct.unpack_from(
+            "<II", self._buf, self._string_offsets_at + sid * _U32.size
+        )
+        return self._buf[self._blob_at + start : self._blob_at + end].decode("utf-8")
+
+    def _decode_question(self, position):
+        raw_id, question_sid, answer_sid, first_ref, n_options, n_tags = (
+            _QUESTION.unpack_from(
+                self._buf, self._questions_at + position * _QUESTION.size
+            )
+        )
+        sids = struct.unpack_from(
+            f"<{n_options + n_tags}I",
+            self._buf,
+            self._option_refs_at + first_ref * _U32.size,
+        )
+        return MappingProxyType(
+            {
+                "question": self._string(question_sid),
+                "options": tuple(self._string(sid) for sid in sids[:n_options]),
+                "answer": self._string(answer_sid),
+                "tags": tuple(self._string(sid) for sid in sids[n_options:]),
+                "id": raw_id.hex(),
+            }
+        )
+
+
+def compiled_path(path):
+    """Location of the compiled artifact for a YAML bank."""
+    return os.path.splitext(path)[0] + COMPILED_SUFFIX
+
+
+def compile_bank(path, output=None):
+    """Compiles a YAML bank into the binary ``.qbank`` format.
+
+    Strings are interned, so repeated options are stored once. The artifact
+    records the source's stat and sha256 so readers can tell when it's stale.
+    Returns the output path.
+    """
+    output = output or compiled_path(path)
+    stat = os.stat(path)
+    with open(path, "rb") as f:
+        raw = f.read()
+    data = yaml.load(raw, Loader=_YAML_LOADER) or {}
+
+    strings = {}
+
+    def intern(text):
+        sid = strings.get(text)
+        if sid is None:
+            sid = strings[text] = len(strings)
+        return sid
+
+    category_rows = []
+    question_rows = []
+    option_refs = []
+    for category, questions in data.items():
+        category_rows.append(
+            _CATEGORY.pack(intern(category), len(question_rows), len(questions or ()))
+        )
+        for q in questions or ():
+            q = _freeze_question(q)
+            question_rows.append(
+                _QUESTION.pack(
+                    bytes.fromhex(q["id"]),
+                    intern(q["question"]),
+                    intern(q["answer"]),
+                    len(option_refs),
+                    len(q["options"]),
+                    len(q["tags"]),
+                )
+            )
+            option_refs.extend(intern(opt) for opt in q["options"])
+            option_refs.extend(intern(tag) for tag in q["tags"])
+
+    blob = bytearray()
+    string_offsets = [0]
+    for text in strings:
+        blob += text.encode("utf-8")
+        string_offsets.append(len(blob))
+
+    header = _HEADER.pack(
+        _MAGIC,
+        _FORMAT_VERSION,
+        0,
+        stat.st_mtime_ns,
+        stat.st_size,
+        hashlib.sha256(raw).digest(),
+        len(strings),
+        len(category_rows),
+        len(question_rows),
+        len(option_refs),
+    )
+
+    # Write beside the target and swap it in, so open maps never see a torn file
+    tmp_path = f"{output}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.writelines(category_rows)
+        f.writelines(question_rows)
+        f.write(struct.pack(f"<{len(option_refs)}I", *option_refs))
+        f.write(struct.pack(f"<{len(string_offsets)}I", *string_offsets))
+        f.write(blob)
+    os.replace(tmp_path, output)
+    return output
+
+
+def _open_compiled(path, source_path, source_stat):
+    """Maps a compiled bank, or returns None if it is missing, invalid or stale."""
+    try:
+        with open(path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        bank = CompiledQuestionBank(buf)
+    except (OSError, ValueError, struct.error):
+        return None
+
+    if (bank.source_mtime_ns, bank.source_size) == (
+        source_stat.st_mtime_ns,
+        source_stat.st_size,
+    ):
+        return bank
+    # The YAML was touched (e.g. by a checkout); only trust the hash
+    with open(source_path, "rb") as f:
+        if hashlib.sha256(f.read()).digest() == bank.source_digest:
+            return bank
+    return None
+
+
+def ensure_compiled(path):
+    """Compiles ``path`` unless a fresh artifact is already next to it.
+
+    Returns the artifact path. Processes that map the same artifact share
+    its pages through the OS page cache.
+    """
+    artifact = compiled_path(path)
+    if _open_compiled(artifact, path, os.stat(path)) is None:
+        compile_bank(path, artifact)
+    return artifact
+
+
+def parse_bank(raw, version=None):
+    """Parses YAML bytes into a QuestionBank."""
+    return QuestionBank(yaml.load(raw, Loader=_YAML_LOADER), version)
+
+
+def _stat_key(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def get_bank(path):
+    """Returns the shared bank for ``path``, reloading it only if the file changed.
+
+    A fresh compiled artifact next to the YAML (see ``compile_bank``) is
+    memory-mapped instead of parsing; a missing or stale one falls back to YAML.
+    A couple of stat calls is all it costs when nothing changed. When the YAML
+    moved, it is only re-parsed if its content hash differs.
+    Raises FileNotFoundError / yaml.YAMLError like a plain load would.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    artifact = compiled_path(path)
+    stat_key = ((stat.st_mtime_ns, stat.st_size), _stat_key(artifact))
+
+    entry = _cache.get(path)
+    if entry is not None and entry[0] == stat_key:
+        return entry[2]
+
+    with _cache_lock:
+        # Another session may have reloaded it while we waited
+        entry = _cache.get(path)
+        if entry is not None and entry[0] == stat_key:
+            return entry[2]
+
+        bank = None
+        if stat_key[1] is not None:
+            bank = _open_compiled(artifact, path, stat)
+
+        if bank is None:
+            with open(path, "rb") as f:
+                raw = f.read()
+            digest = hashlib.sha256(raw).hexdigest()
+            if entry is not None and entry[1] == digest:
+                # Touched but not edited: keep the loaded bank
+                bank = entry[2]
+            else:
+                bank = parse_bank(raw, version=digest)
+
+        _cache[path] = (stat_key, bank.version, bank)
+        return bank
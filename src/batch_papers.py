@@ -0,0 +1,286 @@
+"""Generates a batch of distinct papers up front, e.g. for proctored centres.
+
+    python src/batch_papers.py --count 5000 --output papers.jsonl
+        [--max-overlap 20] [--max-exposure 0.3] [--workers 8]
+
+Papers are drawn by the same sampler as the app (per-category counts,
+one question per near-duplicate cluster) in a process pool. Questions are
+weighted by how often the batch has used them so far, which evens out
+exposure. Each candidate is then checked against every paper accepted
+before it. It is rejected, and redrawn, if it shares more than
+``--max-overlap`` questions with any one of them or uses a question that
+already reached ``--max-exposure``. Accepted papers stream out as JSONL, one
+``{"paper": n, "questions": [id, ...]}`` per line.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bank import get_bank
+from sampling import generate_paper
+
+# Same layout as the app's SECTIONS
+DEFAULT_SECTIONS = "cs=36,math=24,logical_reasoning=15"
+# Give up once this many rounds in a row accept nothing
+MAX_IDLE_ROUNDS = 5
+# Floor for exposure weights. Without it, a question far ahead of the rest
+# underflows to 0 and is never drawn again (and ties with the others in
+# index order). Capped questions sit a further factor below.
+MIN_WEIGHT = 1e-9
+CAPPED_WEIGHT = MIN_WEIGHT**2
+
+# --- Worker side ---
+_worker_bank = None
+
+
+def _init_worker(filename):
+    global _worker_bank
+    _worker_bank = get_bank(filename)
+
+
+def exposure_weights(counts, spread, cap=None):
+    """Weights that shrink by ``spread`` for each use above the least-used question.
+
+    Weights bottom out at ``MIN_WEIGHT``, so heavily used questions keep a
+    small chance. Questions used ``cap`` times or more get ``CAPPED_WEIGHT``,
+    which in practice puts them after every other question, in random order.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    if not len(counts):
+        return []
+    weights = np.maximum(np.power(spread, counts.min() - counts), MIN_WEIGHT)
+    if cap is not None:
+        weights[counts >= cap] = CAPPED_WEIGHT
+    return weights.tolist()
+
+
+def generate_chunk(sections, exposure, spread, cap, distinct, seed, count):
+    """Draws ``count`` candidate papers; runs in a worker process.
+
+    ``exposure`` counts the uses of every flat index so far. The worker's own
+    papers are added to its copy as it goes. Returns the papers as raw
+    ``array('I')`` bytes.
+    """
+    bank = _worker_bank
+    rng = random.Random(seed)
+    spans = {}
+    for category, _ in sections:
+        if category in bank:
+            start = bank.offsets[category]
+            spans[category] = (start, start + len(bank[category]))
+    papers = []
+    for _ in range(count):
+        weights = {
+            category: exposure_weights(exposure[start:end], spread, cap)
+            for category, (start, end) in spans.items()
+        }
+        paper = generate_paper(
+            bank, sections, rng=rng, distinct=distinct, weights=weights
+        )
+        exposure[np.frombuffer(paper, dtype=np.uint32)] += 1
+        papers.append(paper.tobytes())
+    return papers
+
+
+# --- Coordinator side ---
+class BatchConstraints:
+    """Accepts papers one by one, enforcing the limits between them.
+
+    Keeps, for every question, the numbers of the accepted papers that use
+    it. Overlap with all earlier papers is then one ``bincount`` over the
+    candidate's questions, and the cost grows with their exposure rather
+    than with the batch size.
+    """
+
+    def __init__(self, bank_size, max_overlap=None, max_exposure=None):
+        self.max_overlap = max_overlap
+        self.max_exposure = max_exposure
+        self.exposure = np.zeros(bank_size, dtype=np.int64)
+        self.papers_with = [array("I") for _ in range(bank_size)]
+        self.accepted = 0
+        self.largest_overlap = 0
+
+    def overlap(self, paper):
+        """Most questions ``paper`` shares with any one accepted paper."""
+        hits = [
+            np.frombuffer(self.papers_with[index], dtype=np.uint32)
+            for index in paper
+            if self.papers_with[index]
+        ]
+        if not hits:
+            return 0
+        return int(np.bincount(np.concatenate(hits)).max())
+
+    def add(self, paper):
+        """Accepts ``paper`` if it keeps within the limits; returns whether it did."""
+        if self.max_exposure is not None and any(
+            self.exposure[index] >= self.max_exposure for index in paper
+        ):
+            return False
+        overlap = self.overlap(paper)
+        if self.max_overlap is not None and overlap > self.max_overlap:
+            return False
+        for index in paper:
+            self.papers_with[index].append(self.accepted)
+        self.exposure[np.frombuffer(paper, dtype=np.uint32)] += 1
+        self.accepted += 1
+        self.largest_overlap = max(self.largest_overlap, overlap)
+        return True
+
+
+def generate_batch(
+    filename,
+    sections,
+    count,
+    out,
+    max_overlap=None,
+    max_exposure=None,
+    spread=2.0,
+    distinct=True,
+    workers=None,
+    chunk=16,
+    seed=0,
+):
+    """Writes ``count`` papers to ``out`` as JSONL; returns a stats dict.
+
+    Work goes out in rounds. Every task in a round sees the same exposure
+    snapshot and results are accepted in submission order, so a given seed
+    and worker count always give the same batch. ``max_exposure`` is a
+    fraction of ``count``. Stops early if the constraints can't be met.
+    """
+    bank = get_bank(filename)
+    bank_size = sum(len(bank[category]) for category in bank)
+    cap = None
+    if max_exposure is not None:
+        cap = max(1, int(max_exposure * count))
+    constraints = BatchConstraints(bank_size, max_overlap, cap)
+    stats = {"papers": 0, "candidates": 0, "rejected": 0}
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(filename,)
+    ) as pool:
+        tasks_per_round = 2 * (workers or os.cpu_count())
+        task = 0
+        idle_rounds = 0
+        while constraints.accepted < count and idle_rounds < MAX_IDLE_ROUNDS:
+            remaining = count - constraints.accepted
+            tasks = min(tasks_per_round, -(-remaining // chunk))
+            seeds = [seed * 1_000_003 + task + n for n in range(tasks)]
+            task += tasks
+            results = pool.map(
+                generate_chunk,
+                [sections] * tasks,
+                [constraints.exposure] * tasks,
+                [spread] * tasks,
+                [cap] * tasks,
+                [distinct] * tasks,
+                seeds,
+                [chunk] * tasks,
+            )
+            before = constraints.accepted
+            for papers in results:
+                for raw in papers:
+                    if constraints.accepted == count:
+                        break
+                    paper = array("I", raw)
+                    stats["candidates"] += 1
+                    if not constraints.add(paper):
+                        stats["rejected"] += 1
+                        continue
+                    record = {
+                        "paper": constraints.accepted,
+                        "questions": [bank.id_of(index) for index in paper],
+                    }
+                    out.write(json.dumps(record) + "\n")
+            idle_rounds = idle_rounds + 1 if constraints.accepted == before else 0
+
+    stats["papers"] = constraints.accepted
+    stats["elapsed_s"] = time.perf_counter() - started
+    stats["largest_overlap"] = constraints.largest_overlap
+    used = constraints.exposure[constraints.exposure > 0]
+    stats["questions_used"] = int(len(used))
+    stats["exposure_min"] = int(used.min()) if len(used) else 0
+    stats["exposure_max"] = int(used.max()) if len(used) else 0
+    return stats
+
+
+def parse_sections(text):
+    """Parses "cs=36,math=24" into [("cs", 36), ("math", 24)]."""
+    sections = []
+    for part in text.split(","):
+        category, _, size = part.partition("=")
+        sections.append((category.strip(), int(size)))
+    return sections
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a batch of distinct papers")
+    parser.add_argument("--count", type=int, required=True, help="Papers to generate")
+    parser.add_argument("--output", default="-", help="JSONL file (default: stdout)")
+    parser.add_argument("--bank", default="QuestionBank.yaml")
+    parser.add_argument("--sections", default=DEFAULT_SECTIONS)
+    parser.add_argument(
+        "--max-overlap",
+        type=int,
+        default=None,
+        help="Most questions any two papers may share",
+    )
+    parser.add_argument(
+        "--max-exposure",
+        type=float,
+        default=None,
+        help="Largest fraction of the batch any one question may appear in",
+    )
+    parser.add_argument(
+        "--spread",
+        type=float,
+        default=2.0,
+        help="Weight divisor per extra use of a question (1 turns balancing off)",
+    )
+    parser.add_argument(
+        "--allow-duplicates",
+        action="store_true",
+        help="Allow near-duplicate questions on the same paper",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Default: CPU count")
+    parser.add_argument("--chunk", type=int, default=16, help="Papers per task")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        stats = generate_batch(
+            args.bank,
+            parse_sections(args.sections),
+            args.count,
+            out,
+            max_overlap=args.max_overlap,
+            max_exposure=args.max_exposure,
+            spread=args.spread,
+            distinct=not args.allow_duplicates,
+            workers=args.workers,
+            chunk=args.chunk,
+            seed=args.seed,
+        )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(
+        f"Generated {stats['papers']} papers in {stats['elapsed_s']:.1f}s "
+        f"({stats['candidates']} drawn, {stats['rejected']} rejected); "
+        f"largest overlap {stats['largest_overlap']}, exposure "
+        f"{stats['exposure_min']}-{stats['exposure_max']} over "
+        f"{stats['questions_used']} questions",
+        file=sys.stderr,
+    )
+    if stats["papers"] < args.count:
+        sys.exit(f"Only {stats['papers']} papers fit the constraints")
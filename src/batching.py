@@ -0,0 +1,95 @@
+import abc
+import atexit
+import threading
+
+_singletons_lock = threading.RLock()
+
+
+def process_singleton(registry, key, factory):
+    """Returns ``registry[key]``, creating it with ``factory()`` on first use.
+
+    Creation happens at most once per key, even when several sessions ask at
+    the same time; later lookups don't take the lock.
+    """
+    value = registry.get(key)
+    if value is None:
+        with _singletons_lock:
+            value = registry.get(key)
+            if value is None:
+                value = registry[key] = factory()
+    return value
+
+
+class BatchedWriter(abc.ABC):
+    """Buffers writes in memory and hands them to ``_write`` in batches.
+
+    Subclasses add to ``self._pending`` while holding ``self._cond`` (calling
+    ``_queued`` afterwards) and call ``_start`` once they are set up. A
+    background thread then flushes every ``flush_interval`` seconds, as soon
+    as ``batch_size`` entries are pending, and at interpreter exit.
+    ``_io_lock`` is held while a batch is written, so a read of the backing
+    store can't slip in between a batch leaving ``_pending`` and reaching it.
+    """
+
+    def __init__(self, name, flush_interval, batch_size=None):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending = self._empty()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._io_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._flusher, name=name, daemon=True)
+
+    def _start(self):
+        self._worker.start()
+        atexit.register(self.close)
+
+    def _empty(self):
+        """A new, empty pending batch."""
+        return {}
+
+    def _queued(self):
+        """Wakes the flusher if a batch is due; call with ``_cond`` held."""
+        if self.batch_size is not None and len(self._pending) >= self.batch_size:
+            self._cond.notify()
+
+    def _drain(self):
+        """Takes the pending batch, leaving an empty one."""
+        with self._cond:
+            batch = self._pending
+            self._pending = self._empty()
+        return batch
+
+    @abc.abstractmethod
+    def _write(self, batch):
+        """Makes ``batch`` durable; called with ``_io_lock`` held."""
+
+    def flush(self):
+        """Writes everything pending now; returns what ``_write`` returned."""
+        with self._io_lock:
+            batch = self._drain()
+            if not batch:
+                return None
+            return self._write(batch)
+
+    def _flusher(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(self._due, timeout=self.flush_interval)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def _due(self):
+        if self._closed:
+            return True
+        return self.batch_size is not None and len(self._pending) >= self.batch_size
+
+    def close(self):
+        """Stops the flusher after one last flush."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._worker.is_alive():
+            self._worker.join()
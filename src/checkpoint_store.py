@@ -0,0 +1,197 @@
+import json
+import os
+import sqlite3
+import time
+from typing import NamedTuple
+
+from batching import BatchedWriter, process_singleton
+
+# --- Process-wide stores ---
+_stores = {}
+
+
+class Checkpoint(NamedTuple):
+    """A resumable exam: question IDs in paper order plus progress by slot."""
+
+    question_ids: tuple
+    bank_version: str
+    deadline: float
+    current: int
+    answers: dict  # slot -> chosen option index + 1
+    times: dict  # slot -> total seconds spent
+
+
+def _empty_pending():
+    return {"answers": {}, "times": {}, "current": None}
+
+
+class CheckpointStore(BatchedWriter):
+    """Durable in-progress exams in a local SQLite database (WAL mode).
+
+    ``start`` and ``finish`` are written straight away. Answer, time and
+    navigation events are coalesced per token (only the latest value per
+    slot is kept) and written in one transaction by a background thread,
+    every ``flush_interval`` seconds or once ``batch_size`` tokens are
+    pending, so a click never waits on the disk. ``load`` sees pending events.
+    """
+
+    def __init__(self, path, batch_size=64, flush_interval=0.5):
+        super().__init__("checkpoint-flush", flush_interval, batch_size)
+        self.path = path
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS exams (
+                token TEXT PRIMARY KEY,
+                bank_version TEXT,
+                question_ids TEXT NOT NULL,
+                deadline REAL NOT NULL,
+                current INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS answers (
+                token TEXT NOT NULL,
+                slot INTEGER NOT NULL,
+                choice INTEGER NOT NULL DEFAULT 0,
+                time_spent REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (token, slot)
+            );
+            """
+        )
+        self._conn.commit()
+        self._start()
+
+    # --- Writes ---
+    def start(self, token, bank_version, question_ids, deadline):
+        """Records a new exam for ``token``, replacing any earlier one."""
+        with self._io_lock:
+            with self._cond:
+                self._pending.pop(token, None)
+            self._conn.execute("DELETE FROM answers WHERE token = ?", (token,))
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO exams
+                    (token, bank_version, question_ids, deadline, current, updated_at)
+                VALUES (?, ?, ?, ?, 0, ?)
+                """,
+                (
+                    token,
+                    bank_version,
+                    json.dumps(list(question_ids)),
+                    deadline,
+                    time.time(),
+                ),
+            )
+            self._conn.commit()
+
+    def _queue(self, token):
+        """Returns the pending events of ``token``; call with ``_cond`` held."""
+        pending = self._pending.get(token)
+        if pending is None:
+            pending = self._pending[token] = _empty_pending()
+            self._queued()
+        return pending
+
+    def record_answer(self, token, slot, choice):
+        with self._cond:
+            self._queue(token)["answers"][slot] = choice
+
+    def record_time(self, token, slot, seconds):
+        with self._cond:
+            self._queue(token)["times"][slot] = seconds
+
+    def record_position(self, token, current):
+        with self._cond:
+            self._queue(token)["current"] = current
+
+    def finish(self, token):
+        """Forgets the exam of ``token`` (submitted or abandoned)."""
+        with self._io_lock:
+            with self._cond:
+                self._pending.pop(token, None)
+            self._conn.execute("DELETE FROM answers WHERE token = ?", (token,))
+            self._conn.execute("DELETE FROM exams WHERE token = ?", (token,))
+            self._conn.commit()
+
+    # --- Reads ---
+    def load(self, token):
+        """Returns the ``Checkpoint`` of ``token``, or None if it has no exam."""
+        with self._io_lock:
+            row = self._conn.execute(
+                "SELECT question_ids, bank_version, deadline, current FROM exams "
+                "WHERE token = ?",
+                (token,),
+            ).fetchone()
+            if row is None:
+                return None
+            answers = {}
+            times = {}
+            for slot, choice, seconds in self._conn.execute(
+                "SELECT slot, choice, time_spent FROM answers WHERE token = ?", (token,)
+            ):
+                answers[slot] = choice
+                times[slot] = seconds
+            with self._cond:
+                pending = self._pending.get(token, _empty_pending())
+                answers.update(pending["answers"])
+                times.update(pending["times"])
+                current = row[3] if pending["current"] is None else pending["current"]
+        return Checkpoint(
+            question_ids=tuple(json.loads(row[0])),
+            bank_version=row[1],
+            deadline=row[2],
+            current=current,
+            answers=answers,
+            times=times,
+        )
+
+    # --- Flushing ---
+    def _write(self, batch):
+        # Events that raced a finish() have no exam left to update
+        placeholders = ",".join("?" * len(batch))
+        live = {
+            token
+            for (token,) in self._conn.execute(
+                f"SELECT token FROM exams WHERE token IN ({placeholders})",
+                list(batch),
+            )
+        }
+        now = time.time()
+        answers = []
+        times = []
+        positions = []
+        for token, pending in batch.items():
+            if token not in live:
+                continue
+            answers.extend((token, s, c) for s, c in pending["answers"].items())
+            times.extend((token, s, t) for s, t in pending["times"].items())
+            positions.append((pending["current"], now, token))
+        self._conn.executemany(
+            """
+            INSERT INTO answers (token, slot, choice) VALUES (?, ?, ?)
+            ON CONFLICT(token, slot) DO UPDATE SET choice = excluded.choice
+            """,
+            answers,
+        )
+        self._conn.executemany(
+            """
+            INSERT INTO answers (token, slot, time_spent) VALUES (?, ?, ?)
+            ON CONFLICT(token, slot) DO UPDATE SET time_spent = excluded.time_spent
+            """,
+            times,
+        )
+        self._conn.executemany(
+            "UPDATE exams SET current = COALESCE(?, current), updated_at = ? "
+            "WHERE token = ?",
+            positions,
+        )
+        self._conn.commit()
+
+
+def get_checkpoint_store(path):
+    """Returns the process-wide checkpoint store for ``path``."""
+    path = os.path.abspath(path)
+    return process_singleton(_stores, path, lambda: CheckpointStore(path))
@@ -0,0 +1,171 @@
+import re
+import zlib
+
+import numpy as np
+
+# --- MinHash / LSH parameters ---
+# 16 bands of 4 rows make pairs with Jaccard similarity around 0.5 and up
+# likely candidates; candidates are then checked against THRESHOLD.
+NUM_PERM = 64
+BANDS = 16
+THRESHOLD = 0.8
+_SEED = 20240611
+_CHUNK = 1 << 16  # shingles hashed per block, bounds the (NUM_PERM, chunk) matrix
+
+_TOKEN = re.compile(r"[a-z]+|\d+")
+_NUMBER = re.compile(r"\d+")
+
+
+def _tokens(text):
+    # Numbers are masked so questions that differ only in them still match
+    return _TOKEN.findall(_NUMBER.sub("0", str(text).lower()))
+
+
+def shingles(question):
+    """Normalized shingles of a question: word 3-grams of the text plus each option."""
+    words = _tokens(question["question"])
+    grams = {" ".join(words[i : i + 3]) for i in range(max(1, len(words) - 2))}
+    grams.update("option:" + " ".join(_tokens(option)) for option in question["options"])
+    return grams
+
+
+def _hash_shingles(grams):
+    return [zlib.crc32(gram.encode("utf-8")) for gram in grams]
+
+
+class DuplicateIndex:
+    """MinHash/LSH index of a bank's questions, by flat bank index.
+
+    ``clusters[i]`` is the smallest flat index of the near-duplicate group
+    question ``i`` belongs to (``i`` itself if it has none). ``match`` finds a
+    near-duplicate of a question that isn't in the bank, and ``add`` also
+    indexes it when it is new, e.g. while ingesting a batch.
+
+    Candidates only come from shared LSH buckets, so building is
+    O(n log n) rather than comparing every pair.
+    """
+
+    def __init__(
+        self, questions=(), threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self._rows = num_perm // bands
+        rng = np.random.default_rng(_SEED)
+        self._mul = rng.integers(0, 1 << 64, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._add = rng.integers(0, 1 << 64, num_perm, dtype=np.uint64)
+        self._band_mul = rng.integers(1, 1 << 63, self._rows, dtype=np.uint64)
+
+        self.signatures = self._signatures([shingles(q) for q in questions])
+        self._sorted = []  # per band: (sorted keys, flat indices in that order)
+        self.clusters = self._cluster()
+        self._extra = []  # signatures added after building, and their buckets
+        self._extra_buckets = {}
+
+    def __len__(self):
+        return len(self.signatures) + len(self._extra)
+
+    def _signatures(self, shingle_sets):
+        """(n, num_perm) uint32 MinHash signatures, computed in bounded blocks."""
+        out = np.empty((len(shingle_sets), len(self._mul)), dtype=np.uint32)
+        start = 0
+        while start < len(shingle_sets):
+            hashes, starts = [], []
+            stop = start
+            while stop < len(shingle_sets) and (not hashes or len(hashes) < _CHUNK):
+                starts.append(len(hashes))
+                hashes.extend(_hash_shingles(shingle_sets[stop]) or [0])
+                stop += 1
+            x = np.asarray(hashes, dtype=np.uint64)
+            # Multiply-shift hashing (mod 2**64, keep the high bits): one
+            # 32-bit hash function per row
+            values = self._mul[:, None] * x[None, :] + self._add[:, None]
+            values >>= np.uint64(32)
+            out[start:stop] = np.minimum.reduceat(values, starts, axis=1).T
+            start = stop
+        return out
+
+    def _band_keys(self, signatures):
+        """(n, bands) uint64 key per band of each signature."""
+        banded = signatures.reshape(len(signatures), self.bands, self._rows)
+        return (banded.astype(np.uint64) * self._band_mul).sum(axis=2)
+
+    def _similar(self, a, b):
+        return np.count_nonzero(a == b) >= self.threshold * len(a)
+
+    def _cluster(self):
+        """Unions LSH candidates that pass the threshold; keeps each band's buckets."""
+        signatures = self.signatures
+        n = len(signatures)
+        parent = np.arange(n, dtype=np.int64)
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        keys = self._band_keys(signatures)
+        for band in range(self.bands):
+            order = np.argsort(keys[:, band], kind="stable")
+            sorted_keys = keys[order, band]
+            self._sorted.append((sorted_keys, order))
+            # Runs of equal keys are the buckets; compare members to the head
+            starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+            sizes = np.diff(np.r_[starts, n])
+            for start, size in zip(starts[sizes > 1].tolist(), sizes[sizes > 1].tolist()):
+                bucket = order[start : start + size]
+                head = bucket[0]
+                agree = np.count_nonzero(signatures[bucket[1:]] == signatures[head], axis=1)
+                for member in bucket[1:][agree >= self.threshold * signatures.shape[1]]:
+                    a, b = find(head), find(member)
+                    if a != b:
+                        parent[max(a, b)] = min(a, b)
+
+        return np.fromiter((find(i) for i in range(n)), dtype=np.int32, count=n)
+
+    def _signature(self, i):
+        base = len(self.signatures)
+        return self.signatures[i] if i < base else self._extra[i - base]
+
+    def _candidates(self, band, key):
+        sorted_keys, order = self._sorted[band]
+        lo = int(np.searchsorted(sorted_keys, key, side="left"))
+        hi = int(np.searchsorted(sorted_keys, key, side="right"))
+        yield from order[lo:hi].tolist()
+        yield from self._extra_buckets.get((band, key), ())
+
+    def _lookup(self, signature):
+        keys = self._band_keys(signature[None, :])[0]
+        for band, key in enumerate(keys.tolist()):
+            for i in self._candidates(band, key):
+                if self._similar(signature, self._signature(i)):
+                    return i, keys
+        return None, keys
+
+    def match(self, question):
+        """Returns the index of a near-duplicate of ``question``, or None."""
+        return self._lookup(self._signatures([shingles(question)])[0])[0]
+
+    def add(self, question):
+        """Indexes ``question`` unless it near-duplicates an indexed one.
+
+        Returns the index of that near-duplicate, or None if it was added.
+        """
+        signature = self._signatures([shingles(question)])[0]
+        duplicate, keys = self._lookup(signature)
+        if duplicate is None:
+            i = len(self)
+            self._extra.append(signature)
+            for band, key in enumerate(keys.tolist()):
+                self._extra_buckets.setdefault((band, key), []).append(i)
+        return duplicate
+
+
+def build_index(bank, threshold=THRESHOLD):
+    """Builds the near-duplicate index over every question, in flat bank order."""
+    return DuplicateIndex(
+        (q for category in bank for q in bank[category]), threshold=threshold
+    )
@@ -0,0 +1,34 @@
+import os
+import time
+
+import streamlit.components.v1 as components
+
+import instrumentation
+
+# Seconds of clock disagreement tolerated when the browser reports expiry
+EXPIRY_GRACE_SECONDS = 2
+
+_COMPONENT_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "components", "exam_timer"
+)
+_timer = components.declare_component("exam_timer", path=_COMPONENT_DIR)
+
+
+@instrumentation.timed("exam_timer")
+def exam_timer(deadline, key="exam_timer"):
+    """Counts down to ``deadline`` (epoch seconds) in the browser.
+
+    The iframe is mounted once and kept across reruns; each rerun only
+    resyncs it with the server clock. Returns True once the deadline has
+    passed, either on the server or reported by the browser when its countdown
+    hit zero (so idle candidates get submitted without a manual rerun).
+    """
+    now = time.time()
+    fired = _timer(
+        deadline_ms=int(deadline * 1000),
+        now_ms=int(now * 1000),
+        key=key,
+        default=None,
+    )
+    remaining = deadline - now
+    return remaining <= 0 or (fired is not None and remaining <= EXPIRY_GRACE_SECONDS)
@@ -0,0 +1,265 @@
+"""Lightweight timing spans, in-process histograms and per-session profiling.
+
+Off unless ``MOCKOUT_METRICS=1``: ``timed`` then returns the function
+unchanged and ``span`` a shared no-op context, so instrumented code costs
+nothing measurable. When on, every span lands in a fixed-bucket histogram
+that can be read as a summary or as Prometheus text (optionally written to
+``MOCKOUT_METRICS_FILE`` for the node_exporter textfile collector).
+"""
+
+import bisect
+import contextlib
+import cProfile
+import functools
+import hmac
+import os
+import threading
+import time
+import uuid
+
+ENABLED = os.environ.get("MOCKOUT_METRICS", "") not in ("", "0", "false")
+# Unlocks the admin view (?admin=<token>) and profiling (?profile=<token>)
+ADMIN_TOKEN = os.environ.get("MOCKOUT_ADMIN_TOKEN", "")
+METRICS_FILE = os.environ.get("MOCKOUT_METRICS_FILE")
+PROFILE_DIR = os.environ.get("MOCKOUT_PROFILE_DIR", "profiles")
+# Set per process when several workers serve the app (see deploy/launch.py)
+WORKER = os.environ.get("MOCKOUT_WORKER", "")
+
+# Upper bounds in seconds, Prometheus style (plus an implicit +Inf)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5)
+BUCKETS += (1.0, 2.5, 5.0, 10.0)
+
+# --- Process-wide histograms ---
+_histograms = {}
+_histograms_lock = threading.Lock()
+_NOOP = contextlib.nullcontext()
+
+# --- Process-wide profiler slot ---
+_profiler_lock = threading.Lock()
+_scope = threading.local()  # Set while a rerun's scope is open on this thread
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram; safe to share between threads."""
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        slot = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.counts[slot] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q):
+        """Estimates the ``q`` quantile by interpolating inside its bucket."""
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+            largest = self.max
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for slot, count in enumerate(counts):
+            if count and seen + count >= rank:
+                low = BUCKETS[slot - 1] if slot else 0.0
+                high = BUCKETS[slot] if slot < len(BUCKETS) else largest
+                return min(low + (high - low) * (rank - seen) / count, largest)
+            seen += count
+        return largest
+
+
+def get_histogram(name):
+    histogram = _histograms.get(name)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(name, Histogram(name))
+    return histogram
+
+
+@contextlib.contextmanager
+def _timing(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        get_histogram(name).observe(time.perf_counter() - started)
+
+
+def span(name):
+    """Context manager timing its block into the ``name`` histogram."""
+    return _timing(name) if ENABLED else _NOOP
+
+
+def timed(name):
+    """Decorator timing every call into the ``name`` histogram."""
+
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _timing(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+# --- Reporting ---
+def summary():
+    """One dict per span: count, total/mean/max seconds and p50/p95/p99."""
+    with _histograms_lock:
+        histograms = sorted(_histograms.values(), key=lambda h: h.name)
+    return [
+        {
+            "span": h.name,
+            "count": h.count,
+            "total_s": h.sum,
+            "mean_ms": 1000 * h.sum / h.count if h.count else 0.0,
+            "p50_ms": 1000 * h.quantile(0.5),
+            "p95_ms": 1000 * h.quantile(0.95),
+            "p99_ms": 1000 * h.quantile(0.99),
+            "max_ms": 1000 * h.max,
+        }
+        for h in histograms
+    ]
+
+
+def prometheus_text():
+    """All histograms in the Prometheus text exposition format."""
+    lines = [
+        "# HELP mockout_span_seconds Time spent in instrumented app code.",
+        "# TYPE mockout_span_seconds histogram",
+    ]
+    with _histograms_lock:
+        histograms = sorted(_histograms.values(), key=lambda h: h.name)
+    worker = f',worker="{WORKER}"' if WORKER else ""
+    for h in histograms:
+        with h._lock:
+            counts, total, count = list(h.counts), h.sum, h.count
+        labels = f'span="{h.name}"{worker}'
+        cumulative = 0
+        for bound, bucket in zip((*BUCKETS, "+Inf"), counts):
+            cumulative += bucket
+            lines.append(
+                f'mockout_span_seconds_bucket{{{labels},le="{bound}"}} {cumulative}'
+            )
+        lines.append(f"mockout_span_seconds_sum{{{labels}}} {total}")
+        lines.append(f"mockout_span_seconds_count{{{labels}}} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path):
+    """Writes ``prometheus_text`` atomically (for the textfile collector)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+
+def _textfile_writer(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_textfile(path)
+        except OSError:
+            pass
+
+
+if ENABLED and METRICS_FILE:
+    threading.Thread(
+        target=_textfile_writer,
+        args=(METRICS_FILE, 15.0),
+        name="metrics-textfile",
+        daemon=True,
+    ).start()
+
+
+# --- Profiling ---
+def is_admin(token):
+    """True if ``token`` matches MOCKOUT_ADMIN_TOKEN (never when it is unset)."""
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(
+        str(token).encode("utf-8"), ADMIN_TOKEN.encode("utf-8")
+    )
+
+
+def start_profiling(session_state):
+    """Turns on cProfile for the session that owns ``session_state``.
+
+    Returns the path its profile is written to.
+    """
+    if session_state.get("profiler") is None:
+        session_state["profiler"] = cProfile.Profile()
+        session_state["profile_path"] = os.path.join(
+            PROFILE_DIR, f"{uuid.uuid4().hex}.prof"
+        )
+    return session_state["profile_path"]
+
+
+@contextlib.contextmanager
+def profiling(session_state):
+    """Profiles the block if ``start_profiling`` was called for this session.
+
+    One profiler per session accumulates over its reruns; after each rerun
+    the totals so far are written out (open with ``python -m pstats``).
+    Only one profiler can be active in an interpreter (on Python 3.12+
+    cProfile uses the process-wide ``sys.monitoring``), so while another
+    session's rerun is being profiled this one runs unprofiled. The profile
+    also picks up calls from other sessions' threads running at the same
+    time. Yields True while profiling, False when the profiler was busy and
+    None when this session isn't profiled.
+    """
+    profiler = session_state.get("profiler")
+    if profiler is None:
+        yield None
+        return
+    if not _profiler_lock.acquire(blocking=False):
+        yield False
+        return
+    try:
+        try:
+            profiler.enable()
+        except ValueError:  # Another profiling tool holds sys.monitoring
+            enabled = False
+        else:
+            enabled = True
+        try:
+            yield enabled
+        finally:
+            if enabled:
+                profiler.disable()
+                os.makedirs(PROFILE_DIR, exist_ok=True)
+                profiler.dump_stats(session_state["profile_path"])
+    finally:
+        _profiler_lock.release()
+
+
+@contextlib.contextmanager
+def rerun_scope(session_state, name):
+    """Profiling plus a ``name`` span around one rerun of the page or a fragment.
+
+    Fragments run inside a full rerun are covered by its scope; only their
+    own reruns open a new one. Yields what ``profiling`` yields (None when
+    nested).
+    """
+    if getattr(_scope, "active", False):
+        yield None
+        return
+    _scope.active = True
+    try:
+        with profiling(session_state) as profiled, span(name):
+            yield profiled
+    finally:
+        _scope.active = False
@@ -0,0 +1,234 @@
+import math
+import os
+import sqlite3
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from batching import BatchedWriter, process_singleton
+
+# --- Process-wide stores ---
+_stores = {}
+
+# Sums kept per question, in table column order. Time uses Welford's running
+# mean and sum of squared deviations. The three score sums give the
+# point-biserial correlation between getting the item right and the rest of
+# the paper's score.
+_FIELDS = (
+    "attempts",
+    "correct",
+    "time_mean",
+    "time_m2",
+    "rest_sum",
+    "rest_sq",
+    "correct_rest",
+)
+
+
+class ItemTable(NamedTuple):
+    """Item statistics as arrays by flat bank index (0 where never attempted)."""
+
+    attempts: np.ndarray
+    p_correct: np.ndarray
+    time_mean: np.ndarray
+    time_sd: np.ndarray
+    discrimination: np.ndarray
+
+
+def _merge(stats, other):
+    """Folds ``other`` into ``stats`` (both field lists) in place; Chan et al."""
+    n_a, n_b = stats[0], other[0]
+    if not n_b:
+        return
+    n = n_a + n_b
+    delta = other[2] - stats[2]
+    stats[2] += delta * n_b / n
+    stats[3] += other[3] + delta * delta * n_a * n_b / n
+    stats[0] = n
+    stats[1] += other[1]
+    for field in (4, 5, 6):
+        stats[field] += other[field]
+
+
+def discrimination(attempts, correct, rest_sum, rest_sq, correct_rest):
+    """Point-biserial correlation of item correctness with the rest score."""
+    n = attempts
+    spread_x = n * correct - correct * correct
+    spread_s = n * rest_sq - rest_sum * rest_sum
+    if n < 2 or spread_x <= 0 or spread_s <= 0:
+        return 0.0
+    return (n * correct_rest - correct * rest_sum) / math.sqrt(spread_x * spread_s)
+
+
+class ItemStatsStore(BatchedWriter):
+    """Per-question statistics, updated online from submissions (SQLite, WAL).
+
+    ``record_submission`` is O(1) per answered question. It folds into
+    in-memory aggregates, and a background thread merges them into the
+    database every ``flush_interval`` seconds in one transaction. The merge
+    happens inside the UPSERT, so several processes can share the file.
+    ``table`` and ``weights`` serve precomputed arrays, rebuilt after a flush
+    (or every ``refresh_interval`` seconds, to pick up other processes).
+    """
+
+    def __init__(self, path, flush_interval=2.0, refresh_interval=60.0):
+        super().__init__("item-stats-flush", flush_interval)
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self._generation = 0
+        self._tables = {}  # bank version -> (generation, built at, table, weights)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS item_stats (
+                q_id TEXT PRIMARY KEY,
+                attempts INTEGER NOT NULL,
+                correct INTEGER NOT NULL,
+                time_mean REAL NOT NULL,
+                time_m2 REAL NOT NULL,
+                rest_sum REAL NOT NULL,
+                rest_sq REAL NOT NULL,
+                correct_rest REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        self._start()
+
+    # --- Writes ---
+    def record_submission(self, ids, outcomes, times):
+        """Adds one submitted paper.
+
+        ``outcomes`` is 1 correct, -1 wrong, 0 unattempted per question (see
+        ``ScoreReport.outcomes``) and ``times`` the seconds spent on each.
+        Unattempted questions are skipped. The rest score of a question is
+        the fraction of the other questions on the paper answered correctly.
+        """
+        size = len(ids)
+        total_correct = sum(1 for outcome in outcomes if outcome > 0)
+        with self._cond:
+            for q_id, outcome, seconds in zip(ids, outcomes, times):
+                if not outcome:
+                    continue
+                x = 1 if outcome > 0 else 0
+                rest = (total_correct - x) / (size - 1) if size > 1 else 0.0
+                stats = self._pending.get(q_id)
+                if stats is None:
+                    stats = self._pending[q_id] = [0, 0, 0.0, 0.0, 0.0, 0.0, 0.0]
+                _merge(stats, [1, x, float(seconds), 0.0, rest, rest * rest, x * rest])
+
+    # --- Flushing ---
+    def _write(self, batch):
+        """Merges a batch of pending aggregates into the database."""
+        self._conn.executemany(
+            f"""
+            INSERT INTO item_stats (q_id, {", ".join(_FIELDS)})
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(q_id) DO UPDATE SET
+                attempts = attempts + excluded.attempts,
+                correct = correct + excluded.correct,
+                time_mean = time_mean + (excluded.time_mean - time_mean)
+                    * excluded.attempts / (attempts + excluded.attempts),
+                time_m2 = time_m2 + excluded.time_m2
+                    + (excluded.time_mean - time_mean)
+                    * (excluded.time_mean - time_mean)
+                    * attempts * excluded.attempts
+                    / (attempts + excluded.attempts),
+                rest_sum = rest_sum + excluded.rest_sum,
+                rest_sq = rest_sq + excluded.rest_sq,
+                correct_rest = correct_rest + excluded.correct_rest
+            """,
+            [(q_id, *stats) for q_id, stats in batch.items()],
+        )
+        self._conn.commit()
+        self._generation += 1
+
+    # --- Reads ---
+    def get(self, q_id):
+        """Returns the stored sums of one question as a dict, or None."""
+        with self._io_lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_FIELDS)} FROM item_stats WHERE q_id = ?", (q_id,)
+            ).fetchone()
+        return None if row is None else dict(zip(_FIELDS, row))
+
+    def _build_table(self, bank):
+        with self._io_lock:
+            rows = {
+                row[0]: row[1:]
+                for row in self._conn.execute(
+                    f"SELECT q_id, {', '.join(_FIELDS)} FROM item_stats"
+                )
+            }
+        size = sum(len(bank[category]) for category in bank)
+        columns = {name: np.zeros(size) for name in ItemTable._fields}
+        index = 0
+        for category in bank:
+            for q_id in bank.ids(category):
+                row = rows.get(q_id)
+                if row is not None and row[0]:
+                    attempts, correct, time_mean, time_m2, *score = row
+                    columns["attempts"][index] = attempts
+                    columns["p_correct"][index] = correct / attempts
+                    columns["time_mean"][index] = time_mean
+                    columns["time_sd"][index] = math.sqrt(time_m2 / attempts)
+                    columns["discrimination"][index] = discrimination(
+                        attempts, correct, *score
+                    )
+                index += 1
+        return ItemTable(**columns)
+
+    def _cached(self, bank):
+        entry = self._tables.get(bank.version)
+        now = time.monotonic()
+        if (
+            entry is None
+            or entry[0] != self._generation
+            or now - entry[1] > self.refresh_interval
+        ):
+            table = self._build_table(bank)
+            entry = (self._generation, now, table, category_weights(bank, table))
+            self._tables = {bank.version: entry}
+        return entry
+
+    def table(self, bank):
+        """The ``ItemTable`` of ``bank``, rebuilt only when the stats changed."""
+        return self._cached(bank)[2]
+
+    def weights(self, bank):
+        """Per-category selection weights (see ``difficulty_weights``)."""
+        return self._cached(bank)[3]
+
+
+def difficulty_weights(table, target=0.6, width=0.25, min_attempts=20):
+    """Selection weights by flat index that favour items near ``target``.
+
+    An item's weight falls off as a Gaussian in the distance between its
+    fraction correct and ``target``, so papers end up around that difficulty.
+    Items that correlate negatively with the rest of the paper (often a wrong
+    answer key) count half. Items with fewer than ``min_attempts`` answers
+    keep weight 1 until there is enough data.
+    """
+    weights = np.exp(-0.5 * ((table.p_correct - target) / width) ** 2)
+    weights[table.discrimination < 0] *= 0.5
+    weights[table.attempts < min_attempts] = 1.0
+    return weights
+
+
+def category_weights(bank, table, **kwargs):
+    """``difficulty_weights`` split per category, as ``generate_paper`` takes them."""
+    weights = difficulty_weights(table, **kwargs)
+    return {
+        category: weights[start : start + len(bank[category])].tolist()
+        for category, start in bank.offsets.items()
+    }
+
+
+def get_item_stats(path):
+    """Returns the process-wide item statistics store for ``path``."""
+    path = os.path.abspath(path)
+    return process_singleton(_stores, path, lambda: ItemStatsStore(path))
@@ -0,0 +1,88 @@
+import random
+import threading
+from collections import deque
+
+from sampling import generate_paper, refresh_recent
+
+# --- Process-wide pools ---
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PaperPool:
+    """Bounded pool of pre-assembled papers, refilled on a worker thread.
+
+    Papers are built without any user's history, so ``take`` only has to pop
+    one and run the per-user recency filter. When a burst drains the pool,
+    ``take`` builds a paper inline instead of waiting. ``weights``, if
+    given, is called before each paper for ``generate_paper``'s per-category
+    weights, so papers follow the latest item statistics; replacements made
+    by the recency filter are drawn with the same weights.
+    """
+
+    def __init__(self, bank, sections, size=64, seed=None, weights=None):
+        self.bank = bank
+        self.sections = tuple(sections)
+        self.size = size
+        self.weights = weights
+        self._rng = random.Random(seed)
+        self._papers = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._worker = threading.Thread(
+            target=self._refill, name="paper-pool", daemon=True
+        )
+        self._worker.start()
+
+    def __len__(self):
+        return len(self._papers)
+
+    def _refill(self):
+        while True:
+            with self._cond:
+                while not self._closed and len(self._papers) >= self.size:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            paper = self._generate(self._rng, self._weights())
+            with self._cond:
+                self._papers.append(paper)
+
+    def _weights(self):
+        return self.weights() if self.weights is not None else None
+
+    def _generate(self, rng, weights):
+        return generate_paper(self.bank, self.sections, rng=rng, weights=weights)
+
+    def take(self, usage_history=(), rng=None):
+        """Returns a paper (``array('I')`` of flat indices) filtered for this user."""
+        with self._cond:
+            paper = self._papers.popleft() if self._papers else None
+            self._cond.notify()
+        weights = self._weights()
+        if paper is None:
+            paper = self._generate(rng, weights)
+        return refresh_recent(
+            self.bank, paper, usage_history, rng=rng, weights=weights
+        )
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._papers.clear()
+            self._cond.notify_all()
+
+
+def get_paper_pool(bank, sections, size=64, weights=None):
+    """Returns the process-wide pool for ``sections``, rebuilt when the bank reloads.
+
+    ``weights`` is only used when the pool is (re)built.
+    """
+    key = tuple(sections)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.bank is not bank:
+            if pool is not None:
+                pool.close()
+            pool = _pools[key] = PaperPool(bank, key, size, weights=weights)
+    return pool
@@ -0,0 +1,116 @@
+"""Imports past question papers from PDFs into the question bank.
+
+    python src/pdf_import.py papers/ --category cs [--workers 8]
+
+Each PDF is read page by page in a worker process and fed through the
+Markdown question parser. New questions are then normalized and appended to
+the YAML bank (see ``utils.BankAppender``). Parsed results are cached per file
+content hash and category, so PDFs already imported into that category are
+skipped on later runs.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader
+
+from utils import BankAppender, iter_markdown_questions
+
+CACHE_DIR = ".pdf_cache"
+
+
+def iter_pdf_lines(raw):
+    """Yields the text lines of a PDF, one page at a time."""
+    reader = PdfReader(io.BytesIO(raw))
+    for page in reader.pages:
+        yield from (page.extract_text() or "").splitlines()
+
+
+def parse_pdf(path, digest):
+    """Parses one PDF; runs in a worker process. Returns (path, digest, questions).
+
+    ``digest`` is the content hash the parent computed for the cache lookup.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    return path, digest, list(iter_markdown_questions(iter_pdf_lines(raw)))
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_path(cache_dir, digest, category):
+    """Cache entry of one PDF imported into one category."""
+    return os.path.join(cache_dir, category, f"{digest}.json")
+
+
+def import_pdfs(directory, filename, category, workers=None, cache_dir=CACHE_DIR):
+    """Imports every PDF under ``directory`` into ``category`` of the bank.
+
+    Returns a dict of counts: files parsed, files skipped as unchanged,
+    questions added, incomplete questions skipped and near-duplicates (of the
+    bank or each other) dropped.
+    """
+    os.makedirs(os.path.join(cache_dir, category), exist_ok=True)
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory)
+        for name in names
+        if name.lower().endswith(".pdf")
+    )
+    digests = {path: _file_digest(path) for path in paths}
+    todo = [
+        path
+        for path in paths
+        if not os.path.exists(_cache_path(cache_dir, digests[path], category))
+    ]
+
+    appender = BankAppender(filename, category)
+    stats = {"parsed": 0, "unchanged": len(paths) - len(todo)}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            parse_pdf,
+            todo,
+            [digests[path] for path in todo],
+            chunksize=4,
+        )
+        for path, digest, questions in results:
+            for q in questions:
+                appender.add(q)
+            appender.flush()
+            # Only cache once the questions are in the bank
+            with open(_cache_path(cache_dir, digest, category), "w") as f:
+                json.dump({"source": path, "questions": questions}, f)
+            stats["parsed"] += 1
+
+    appender.close()
+    stats["added"] = appender.added
+    stats["incomplete"] = appender.skipped
+    stats["duplicates"] = appender.duplicates
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import question papers from PDFs")
+    parser.add_argument("directory", help="Directory searched recursively for PDFs")
+    parser.add_argument("--category", required=True, help="Bank category to import into")
+    parser.add_argument("--bank", default="QuestionBank.yaml")
+    parser.add_argument("--workers", type=int, default=None, help="Default: CPU count")
+    args = parser.parse_args()
+
+    stats = import_pdfs(args.directory, args.bank, args.category, args.workers)
+    print(
+        f"Parsed {stats['parsed']} PDFs ({stats['unchanged']} unchanged), "
+        f"added {stats['added']} questions ({stats['duplicates']} near-duplicates, "
+        f"{stats['incomplete']} incomplete)"
+    )
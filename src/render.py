@@ -0,0 +1,98 @@
+import re
+from typing import NamedTuple
+
+# --- Markdown sanitizing ---
+# Pandoc's rule: no space just inside the dollars, no digit right after the close
+_MATH_SPAN = re.compile(r"(?<!\\)\$(?!\s)[^$\n]+?(?<![\s\\])\$(?!\d)")
+_TABLE_ROW = re.compile(r"^\s*\|")
+_LINE_START = re.compile(r"^(\s*)([#>+\-*]|\d+[.)])(?=\s)")
+_TRAILING_SPACE = re.compile(r"[ \t]+$", re.MULTILINE)
+
+
+class RenderedQuestion(NamedTuple):
+    """Display-ready Markdown for one question; ``options`` keep bank order."""
+
+    question: str
+    options: tuple
+    answer: str
+
+
+def _escape_dollars(text):
+    """Escapes any ``$`` that isn't part of a ``$...$`` span.
+
+    A stray dollar ("costs $5") would otherwise open a LaTeX block that
+    swallows the rest of the text.
+    """
+    pieces = []
+    last = 0
+    for span in _MATH_SPAN.finditer(text):
+        pieces.append(re.sub(r"(?<!\\)\$", r"\\$", text[last : span.start()]))
+        pieces.append(span[0])
+        last = span.end()
+    pieces.append(re.sub(r"(?<!\\)\$", r"\\$", text[last:]))
+    return "".join(pieces)
+
+
+def render_block(text):
+    """Normalizes question text for ``st.markdown``.
+
+    Line endings and trailing spaces are cleaned up, stray dollars escaped,
+    and tables get the blank line before them that Markdown needs.
+    """
+    text = _TRAILING_SPACE.sub("", str(text).replace("\r\n", "\n")).strip()
+    lines = []
+    for line in _escape_dollars(text).split("\n"):
+        previous = lines[-1] if lines else ""
+        if _TABLE_ROW.match(line) and previous and not _TABLE_ROW.match(previous):
+            lines.append("")
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def render_inline(text):
+    """Normalizes an option or answer to a single line of inline Markdown.
+
+    Newlines are folded and a leading "1." / "-" / "#" is escaped so the
+    label isn't turned into a list or heading.
+    """
+    text = " ".join(str(text).split())
+    return _LINE_START.sub(r"\1\\\2", _escape_dollars(text))
+
+
+def render_question(question):
+    return RenderedQuestion(
+        question=render_block(question["question"]),
+        options=tuple(render_inline(option) for option in question["options"]),
+        answer=render_inline(question["answer"]),
+    )
+
+
+class RenderCache:
+    """Lazily rendered questions of one bank, by flat index.
+
+    Entries are keyed by flat index rather than question ID: the ID covers
+    only the text and options, so two questions that differ in ``answer``
+    would share an entry. The cache lives on the bank object, so a reloaded
+    bank starts a fresh one.
+    """
+
+    def __init__(self, bank):
+        self.bank = bank
+        self.version = bank.version
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, index):
+        entry = self._entries.get(index)
+        if entry is None:
+            entry = self._entries[index] = render_question(self.bank.question(index))
+        return entry
+
+    def warm(self, indices=None):
+        """Renders ``indices`` (default: the whole bank) ahead of time."""
+        if indices is None:
+            indices = range(sum(len(self.bank[category]) for category in self.bank))
+        for index in indices:
+            self[index]
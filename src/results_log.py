@@ -0,0 +1,358 @@
+"""Append-only log of submissions as day-partitioned Parquet files.
+
+Each submission is one row: totals, per-section scores and, as list columns,
+the question IDs, chosen options, per-question times and outcomes of the
+paper. Rows are buffered and written in batches as new immutable files:
+
+    results/day=2026-10-18/part-<timestamp>-<pid>-<n>.parquet
+
+``CohortAggregates`` folds the log into running totals for the dashboard.
+It remembers how far into the log it has read (in ``_aggregates.json``), so
+a refresh only lists the latest partitions and reads the files written
+since the last one.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from batching import BatchedWriter, process_singleton
+
+SCHEMA = pa.schema(
+    [
+        ("submitted_at", pa.timestamp("ms", tz="UTC")),
+        ("bank_version", pa.string()),
+        ("score", pa.float64()),
+        ("correct", pa.int32()),
+        ("wrong", pa.int32()),
+        ("unattempted", pa.int32()),
+        ("question_ids", pa.list_(pa.string())),
+        ("choices", pa.list_(pa.uint8())),
+        ("times", pa.list_(pa.float32())),
+        ("outcomes", pa.list_(pa.int8())),
+        ("sections", pa.list_(pa.string())),
+        ("section_scores", pa.list_(pa.float64())),
+        ("section_correct", pa.list_(pa.int32())),
+        ("section_time", pa.list_(pa.float64())),
+    ]
+)
+STATE_FILE = "_aggregates.json"
+# Files are named when their write starts, so a worker can finish a file
+# named a little before one already folded in. Refreshes keep re-checking
+# names this far behind the newest they have seen.
+LATE_WINDOW_NS = 10 * 60 * 10**9
+# Columns the dashboard totals are built from
+_FOLDED = [
+    "submitted_at",
+    "score",
+    "question_ids",
+    "times",
+    "outcomes",
+    "sections",
+    "section_scores",
+    "section_correct",
+    "section_time",
+]
+
+# --- Process-wide logs ---
+_logs = {}
+_aggregates = {}
+
+
+class ResultsLog(BatchedWriter):
+    """Buffers submission rows and writes them out as Parquet files.
+
+    A background thread writes whatever is pending every ``flush_interval``
+    seconds (and at exit), one file per day in the batch. File names carry
+    the process ID, so several workers can share the directory.
+    """
+
+    def __init__(self, directory, flush_interval=60.0):
+        super().__init__("results-flush", flush_interval)
+        self.directory = directory
+        self._written = 0
+        # pyarrow imports some helpers on first use, and the last flush runs
+        # at interpreter exit, when those imports fail; load them now
+        pa.Table.from_pylist([], schema=SCHEMA)
+        self._start()
+
+    def _empty(self):
+        return []
+
+    def record(self, bank_version, question_ids, choices, times, report, sections):
+        """Queues one scored submission.
+
+        ``choices`` holds the chosen option index + 1 per question (0 when
+        unanswered), ``report`` is the paper's ``ScoreReport`` and
+        ``sections`` names its sections in the order of ``report.sections``.
+        """
+        row = {
+            "submitted_at": datetime.now(timezone.utc),
+            "bank_version": bank_version,
+            "score": float(report.score),
+            "correct": report.correct,
+            "wrong": report.wrong,
+            "unattempted": report.unattempted,
+            "question_ids": list(question_ids),
+            "choices": list(choices),
+            "times": list(times),
+            "outcomes": report.outcomes.tolist(),
+            "sections": list(sections),
+            "section_scores": [float(s.score) for s in report.sections],
+            "section_correct": [s.correct for s in report.sections],
+            "section_time": [s.time for s in report.sections],
+        }
+        with self._cond:
+            self._pending.append(row)
+
+    def _write(self, rows):
+        """Writes a batch of rows, one new file per day; returns their paths."""
+        by_day = {}
+        for row in rows:
+            day = row["submitted_at"].date().isoformat()
+            by_day.setdefault(day, []).append(row)
+        paths = []
+        for day, day_rows in sorted(by_day.items()):
+            partition = os.path.join(self.directory, f"day={day}")
+            os.makedirs(partition, exist_ok=True)
+            self._written += 1
+            name = f"part-{time.time_ns()}-{os.getpid()}-{self._written}.parquet"
+            path = os.path.join(partition, name)
+            # Readers only ever see whole files
+            tmp_path = os.path.join(partition, f".{name}.tmp")
+            table = pa.Table.from_pylist(day_rows, schema=SCHEMA)
+            pq.write_table(table, tmp_path, compression="zstd")
+            os.replace(tmp_path, path)
+            paths.append(path)
+        return paths
+
+
+def get_results_log(directory):
+    """Returns the process-wide results log writing into ``directory``."""
+    directory = os.path.abspath(directory)
+    return process_singleton(_logs, directory, lambda: ResultsLog(directory))
+
+
+def log_files(directory, since=None):
+    """Relative paths of the finished Parquet files in the log.
+
+    With ``since`` (an ISO day), partitions of earlier days are skipped.
+    """
+    files = []
+    try:
+        partitions = sorted(os.scandir(directory), key=lambda entry: entry.name)
+    except FileNotFoundError:
+        return files
+    for partition in partitions:
+        if not (partition.is_dir() and partition.name.startswith("day=")):
+            continue
+        if since is not None and partition.name < f"day={since}":
+            continue
+        for entry in os.scandir(partition.path):
+            if entry.name.endswith(".parquet"):
+                files.append(f"{partition.name}/{entry.name}")
+    return sorted(files)
+
+
+def _stamp(path):
+    """The time in a log file's name (see ``ResultsLog._write``), in ns."""
+    return int(os.path.basename(path).split("-")[1])
+
+
+def _flat(table, column):
+    """The values of a list column of ``table``, concatenated."""
+    return table[column].combine_chunks().flatten()
+
+
+def _group_sums(keys, *values):
+    """Per distinct key: (keys, count, sum of each of ``values``).
+
+    Arrow's hash aggregation keeps this linear in the number of values;
+    ``np.unique`` would sort millions of strings.
+    """
+    columns = {"key": keys, **{f"v{i}": v for i, v in enumerate(values)}}
+    grouped = pa.table(columns).group_by("key").aggregate(
+        [("key", "count")] + [(f"v{i}", "sum") for i in range(len(values))]
+    )
+    sums = [grouped[f"v{i}_sum"].to_numpy() for i in range(len(values))]
+    return grouped["key"].to_pylist(), grouped["key_count"].to_numpy(), sums
+
+
+class CohortAggregates:
+    """Running totals over the results log, updated incrementally.
+
+    ``refresh`` reads only files it hasn't seen, folds them in with
+    vectorized group-bys, and saves the totals next to the log. Rather than
+    every file read, it keeps a high-water mark: files named before
+    ``since`` are all counted, and ``recent`` holds the counted ones named
+    after it. Only partitions from around ``since`` on are listed, so work
+    per refresh is proportional to what was written since the last one,
+    however large the log grows.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.state_path = os.path.join(directory, STATE_FILE)
+        self.file_count = 0
+        self.since = 0  # ns; every file named before this is counted
+        self.recent = set()  # Counted files named at or after ``since``
+        self.submissions = 0
+        self.scores = Counter()  # score -> submissions
+        self.days = Counter()  # ISO day -> submissions
+        self.sections = {}  # name -> [papers, score sum, correct sum, time sum]
+        self.questions = {}  # question ID -> [answered, correct, time sum]
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        self.file_count = state["file_count"]
+        self.since = state["since"]
+        self.recent = set(state["recent"])
+        self.submissions = state["submissions"]
+        self.scores = Counter({float(k): v for k, v in state["scores"].items()})
+        self.days = Counter(state["days"])
+        self.sections = state["sections"]
+        self.questions = state["questions"]
+
+    def _save(self):
+        state = {
+            "file_count": self.file_count,
+            "since": self.since,
+            "recent": sorted(self.recent),
+            "submissions": self.submissions,
+            "scores": {str(k): v for k, v in self.scores.items()},
+            "days": self.days,
+            "sections": self.sections,
+            "questions": self.questions,
+        }
+        tmp_path = f"{self.state_path}.tmp{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def refresh(self):
+        """Folds in files written since the last refresh; returns how many."""
+        with self._lock:
+            new = [
+                path
+                for path in log_files(self.directory, self._first_day())
+                if _stamp(path) >= self.since and path not in self.recent
+            ]
+            for path in new:
+                table = pq.read_table(
+                    os.path.join(self.directory, path), columns=_FOLDED
+                )
+                self._fold(table)
+                self.recent.add(path)
+            if new:
+                self.file_count += len(new)
+                newest = max(_stamp(path) for path in self.recent)
+                self.since = max(self.since, newest - LATE_WINDOW_NS)
+                self.recent = {p for p in self.recent if _stamp(p) >= self.since}
+                self._save()
+            return len(new)
+
+    def _first_day(self):
+        """The oldest partition that can hold files named after ``since``."""
+        if not self.since:
+            return None
+        # Rows go into their submission day's partition, which a file named
+        # just after midnight can still belong to
+        oldest = (self.since - LATE_WINDOW_NS) / 1e9
+        return datetime.fromtimestamp(oldest, timezone.utc).date().isoformat()
+
+    def _fold(self, table):
+        if not table.num_rows:
+            return
+        self.submissions += table.num_rows
+        scores, counts = np.unique(table["score"].to_numpy(), return_counts=True)
+        for score, count in zip(scores.tolist(), counts.tolist()):
+            self.scores[score] += count
+        days = table["submitted_at"].cast(pa.date32()).to_pylist()
+        self.days.update(day.isoformat() for day in days)
+
+        unique, counts, sums = _group_sums(
+            _flat(table, "sections"),
+            _flat(table, "section_scores"),
+            _flat(table, "section_correct"),
+            _flat(table, "section_time"),
+        )
+        for i, name in enumerate(unique):
+            totals = self.sections.setdefault(name, [0, 0.0, 0.0, 0.0])
+            totals[0] += int(counts[i])
+            for k, column in enumerate(sums, start=1):
+                totals[k] += float(column[i])
+
+        outcomes = _flat(table, "outcomes")
+        answered = pc.not_equal(outcomes, 0)
+        unique, counts, (correct, seconds) = _group_sums(
+            _flat(table, "question_ids").filter(answered),
+            pc.greater(outcomes, 0).filter(answered).cast(pa.int64()),
+            _flat(table, "times").filter(answered).cast(pa.float64()),
+        )
+        for i, q_id in enumerate(unique):
+            totals = self.questions.setdefault(q_id, [0, 0, 0.0])
+            totals[0] += int(counts[i])
+            totals[1] += int(correct[i])
+            totals[2] += float(seconds[i])
+
+    # --- Views ---
+    def score_distribution(self):
+        """(score, submissions) pairs in score order."""
+        return sorted(self.scores.items())
+
+    def section_averages(self):
+        """One dict per section: papers, average score, correct and time."""
+        return [
+            {
+                "section": name,
+                "papers": papers,
+                "avg_score": score / papers,
+                "avg_correct": correct / papers,
+                "avg_time_s": seconds / papers,
+            }
+            for name, (papers, score, correct, seconds) in sorted(
+                self.sections.items()
+            )
+            if papers
+        ]
+
+    def hardest_questions(self, limit=20, min_answered=20):
+        """The least often correct questions with ``min_answered`` answers or more."""
+        rows = [
+            {
+                "id": q_id,
+                "answered": answered,
+                "p_correct": correct / answered,
+                "avg_time_s": seconds / answered,
+            }
+            for q_id, (answered, correct, seconds) in self.questions.items()
+            if answered >= min_answered
+        ]
+        rows.sort(key=lambda row: (row["p_correct"], -row["answered"]))
+        return rows[:limit]
+
+    def answered_items(self):
+        """Answered questions over every submission."""
+        return sum(totals[0] for totals in self.questions.values())
+
+
+def get_cohort_aggregates(directory):
+    """Returns the process-wide running aggregates of the log in ``directory``."""
+    directory = os.path.abspath(directory)
+    return process_singleton(
+        _aggregates, directory, lambda: CohortAggregates(directory)
+    )
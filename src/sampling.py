@@ -0,0 +1,208 @@
+import heapq
+import math
+import random
+from array import array
+from itertools import islice
+
+import instrumentation
+from bank import question_id
+
+
+def _recency(usage_history):
+    """Maps question ID -> its position in the (most-recent-first) history."""
+    # First occurrence wins, like list.index()
+    recency = {}
+    for position, q_id in enumerate(usage_history):
+        recency.setdefault(q_id, position)
+    return recency
+
+
+def _recency_weight(position, max_history):
+    return 0.2 + (position / max_history) * 0.8
+
+
+def recency_weights(ids, usage_history, max_history=5):
+    """Weights for ``ids``: 1.0 if unused, lower the more recently it was used.
+
+    The history is most-recent-first; a question at position ``i`` gets
+    ``0.2 + (i / max_history) * 0.8``.
+    """
+    recency = _recency(usage_history)
+    weights = []
+    for q_id in ids:
+        position = recency.get(q_id)
+        if position is None:
+            weights.append(1.0)
+        else:
+            weights.append(_recency_weight(position, max_history))
+    return weights
+
+
+def weighted_order(weights, rng=None):
+    """Yields indices in weighted random order, without replacement.
+
+    Efraimidis-Spirakis sampling: every item draws an Exp(weight) key once and
+    items come out by increasing key. That is the same distribution as
+    repeatedly picking one item in proportion to the remaining weights, for
+    O(n) setup and O(log n) per item taken.
+    """
+    expovariate = (rng or random).expovariate
+    heap = [
+        (expovariate(weight) if weight > 0 else math.inf, index)
+        for index, weight in enumerate(weights)
+    ]
+    heapq.heapify(heap)
+    while heap:
+        yield heapq.heappop(heap)[1]
+
+
+def sample_indices(weights, count, rng=None):
+    """Picks ``count`` indices in proportion to ``weights``, without replacement."""
+    return list(islice(weighted_order(weights, rng), count))
+
+
+def take_distinct(indices, count, clusters, seen):
+    """Takes ``count`` flat indices from ``indices``, one per duplicate cluster.
+
+    ``clusters`` maps a flat index to its near-duplicate cluster (see
+    ``bank.duplicates``) and ``seen`` holds the clusters already on the paper;
+    it is updated in place. ``indices`` is consumed lazily. If there aren't
+    enough distinct questions, the skipped ones top the result up in draw order.
+    """
+    if clusters is None or count <= 0:
+        return list(islice(indices, max(count, 0)))
+    picked = []
+    spare = []
+    for index in indices:
+        cluster = clusters[index]
+        if cluster in seen:
+            spare.append(index)
+            continue
+        seen.add(cluster)
+        picked.append(index)
+        if len(picked) == count:
+            return picked
+    return picked + spare[: count - len(picked)]
+
+
+@instrumentation.timed("weighted_sample")
+def weighted_sample(
+    questions, count, usage_history, max_history=5, ids=None, rng=None, weights=None
+):
+    """Sample questions WITHOUT replacement, with lower probability for recently used ones.
+
+    ``ids`` can pass the category's precomputed question IDs (``bank.ids``) so
+    that only the picked questions are ever read. ``rng`` is any
+    ``random.Random``-like object; pass a seeded one for reproducible runs.
+    ``weights`` are extra per-question weights (e.g. from item statistics)
+    multiplied into the recency ones.
+    """
+    if not questions or count <= 0:
+        return []
+
+    if len(questions) <= count:
+        return questions[:]
+
+    if ids is None:
+        ids = [q.get("id") or question_id(q) for q in questions]
+
+    recency = recency_weights(ids, usage_history, max_history)
+    if weights is not None:
+        recency = [r * w for r, w in zip(recency, weights)]
+    return [questions[i] for i in sample_indices(recency, count, rng)]
+
+
+@instrumentation.timed("generate_paper")
+def generate_paper(
+    bank,
+    sections,
+    usage_history=(),
+    max_history=5,
+    rng=None,
+    distinct=True,
+    weights=None,
+    exclude=None,
+):
+    """Builds one shuffled paper as an ``array('I')`` of flat bank indices.
+
+    ``sections`` is a sequence of (category, count); categories missing from
+    the bank are skipped. With ``distinct``, at most one question per
+    near-duplicate cluster goes on the paper while the bank has enough.
+    ``weights`` can map a category to extra per-question weights (e.g. from
+    item statistics), multiplied into the recency weights. Flat indices in
+    the set ``exclude`` are never drawn, so a section may come up short.
+    """
+    clusters = bank.duplicates.clusters if distinct else None
+    seen = set()
+    paper = array("I")
+    for category, count in sections:
+        if category not in bank or count <= 0:
+            continue
+        category_weights = weights.get(category) if weights else None
+        if category_weights is None:
+            ids = bank.ids(category)
+            category_weights = recency_weights(ids, usage_history, max_history)
+        elif usage_history:
+            ids = bank.ids(category)
+            recency = recency_weights(ids, usage_history, max_history)
+            category_weights = [r * w for r, w in zip(recency, category_weights)]
+        offset = bank.offsets[category]
+        order = (offset + i for i in weighted_order(category_weights, rng))
+        if exclude:
+            order = (index for index in order if index not in exclude)
+        paper.extend(take_distinct(order, count, clusters, seen))
+    (rng or random).shuffle(paper)
+    return paper
+
+
+@instrumentation.timed("refresh_recent")
+def refresh_recent(
+    bank, paper, usage_history, max_history=5, rng=None, distinct=True, weights=None
+):
+    """Applies a user's recency weighting to a paper built without it.
+
+    A question from the history survives with probability equal to its
+    recency weight (capped at 1); the others are swapped, in place, for a
+    weighted draw from the same category that isn't already on the paper
+    (nor, with ``distinct``, a near-duplicate of one). ``weights`` are the
+    per-category weights the paper was built with (see ``generate_paper``),
+    so replacements are drawn the same way. Returns the paper.
+    """
+    if not usage_history:
+        return paper
+    rng = rng or random
+    recency = _recency(usage_history)
+
+    replace = {}  # category -> slots to refill
+    for slot, index in enumerate(paper):
+        position = recency.get(bank.id_of(index))
+        if position is None:
+            continue
+        if rng.random() >= min(1.0, _recency_weight(position, max_history)):
+            replace.setdefault(bank.locate(index)[0], []).append(slot)
+
+    taken = set(paper)
+    clusters = bank.duplicates.clusters if distinct else None
+    seen = set()
+    if clusters is not None:
+        leaving = {slot for slots in replace.values() for slot in slots}
+        seen.update(
+            clusters[index] for slot, index in enumerate(paper) if slot not in leaving
+        )
+    for category, slots in replace.items():
+        offset = bank.offsets[category]
+        category_weights = recency_weights(
+            bank.ids(category), usage_history, max_history
+        )
+        extra = weights.get(category) if weights else None
+        if extra is not None:
+            category_weights = [r * w for r, w in zip(category_weights, extra)]
+        order = (
+            offset + i
+            for i in weighted_order(category_weights, rng)
+            if offset + i not in taken
+        )
+        for index in take_distinct(order, len(slots), clusters, seen):
+            paper[slots.pop()] = index
+            taken.add(index)
+    return paper
@@ -0,0 +1,131 @@
+from typing import NamedTuple
+
+import numpy as np
+
+
+class MarkingScheme(NamedTuple):
+    correct: float = 4
+    wrong: float = -1
+    unattempted: float = 0
+
+
+class SectionStats(NamedTuple):
+    correct: int
+    wrong: int
+    unattempted: int
+    score: float
+    time: float
+    avg_time: float
+
+
+class ScoreReport(NamedTuple):
+    """Scores for one submission.
+
+    ``outcomes`` has one entry per question: 1 correct, -1 wrong,
+    0 unattempted. ``sections`` is in the order of the section codes.
+    """
+
+    score: float
+    correct: int
+    wrong: int
+    unattempted: int
+    outcomes: np.ndarray
+    sections: tuple
+
+
+def answer_key(bank, paper, categories):
+    """Builds the per-paper arrays the engine needs.
+
+    Returns (answer masks, section codes). Bit ``k`` of a question's mask is
+    set when option ``k`` has the answer's text, so repeated options score
+    like the string comparison they replace and an answer that is not among
+    the options can never be matched. A category missing from ``categories``
+    gets code -1 and only counts towards the totals.
+    """
+    codes = {category: code for code, category in enumerate(categories)}
+    answers = np.zeros(len(paper), dtype=np.uint32)
+    sections = np.empty(len(paper), dtype=np.int8)
+    for i, index in enumerate(paper):
+        category, position = bank.locate(index)
+        q = bank[category][position]
+        for k, option in enumerate(q["options"]):
+            if option == q["answer"]:
+                answers[i] |= 1 << k
+        sections[i] = codes.get(category, -1)
+    return answers, sections
+
+
+def score_batch(choices, answers, sections, times, n_sections, scheme=MarkingScheme()):
+    """Scores many submissions in one pass.
+
+    All inputs are (submissions, questions) arrays: ``choices`` holds the
+    picked option index + 1 (0 = unattempted), ``answers`` the correct-option
+    bitmask from ``answer_key``, ``sections`` a code in ``range(n_sections)`` (or -1) and ``times``
+    seconds. Returns a dict of arrays: per-submission ``score``/``correct``/
+    ``wrong``/``unattempted``, per-section ``section_*`` counts, scores and
+    times of shape (submissions, n_sections), and ``outcomes``.
+    """
+    choices = np.atleast_2d(np.asarray(choices, dtype=np.uint32))
+    answers = np.atleast_2d(np.asarray(answers, dtype=np.uint32))
+    sections = np.atleast_2d(np.asarray(sections, dtype=np.int64))
+    times = np.atleast_2d(np.asarray(times, dtype=np.float64))
+
+    attempted = choices > 0
+    picked = np.maximum(choices, 1) - 1
+    correct = attempted & ((answers >> picked) & 1).astype(bool)
+    wrong = attempted & ~correct
+    outcomes = correct.astype(np.int8) - wrong.astype(np.int8)
+    marks = np.where(
+        correct, scheme.correct, np.where(wrong, scheme.wrong, scheme.unattempted)
+    )
+
+    # One flat bincount per measure: bucket = submission * n_sections + section
+    n_subs = choices.shape[0]
+    in_section = sections >= 0
+    buckets = (np.arange(n_subs)[:, None] * n_sections + sections)[in_section]
+    size = n_subs * n_sections
+
+    def per_section(values):
+        return np.bincount(buckets, weights=values[in_section], minlength=size).reshape(
+            n_subs, n_sections
+        )
+
+    section_count = per_section(np.ones_like(times))
+    section_time = per_section(times)
+    return {
+        "score": marks.sum(axis=1),
+        "correct": correct.sum(axis=1),
+        "wrong": wrong.sum(axis=1),
+        "unattempted": (~attempted).sum(axis=1),
+        "outcomes": outcomes,
+        "section_correct": per_section(correct).astype(np.int64),
+        "section_wrong": per_section(wrong).astype(np.int64),
+        "section_unattempted": per_section(~attempted).astype(np.int64),
+        "section_score": per_section(marks).astype(marks.dtype),
+        "section_time": section_time,
+        "section_avg_time": section_time / np.maximum(section_count, 1),
+    }
+
+
+def score_submission(choices, answers, sections, times, n_sections, scheme=MarkingScheme()):
+    """Scores one submission; see ``score_batch`` for the inputs."""
+    batch = score_batch(choices, answers, sections, times, n_sections, scheme)
+    sections_stats = tuple(
+        SectionStats(
+            correct=int(batch["section_correct"][0, s]),
+            wrong=int(batch["section_wrong"][0, s]),
+            unattempted=int(batch["section_unattempted"][0, s]),
+            score=batch["section_score"][0, s].item(),
+            time=float(batch["section_time"][0, s]),
+            avg_time=float(batch["section_avg_time"][0, s]),
+        )
+        for s in range(n_sections)
+    )
+    return ScoreReport(
+        score=batch["score"][0].item(),
+        correct=int(batch["correct"][0]),
+        wrong=int(batch["wrong"][0]),
+        unattempted=int(batch["unattempted"][0]),
+        outcomes=batch["outcomes"][0],
+        sections=sections_stats,
+    )
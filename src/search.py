@@ -0,0 +1,208 @@
+"""Inverted index over a question bank for topic search.
+
+Queries combine terms from the question text and options:
+
+    cache memory          both terms (AND is implied)
+    cache OR memory       either term
+    -stack, NOT stack     without the term
+    addr*                 any term starting with "addr"
+    tag:number-series     questions with that tag (``tags:`` in the YAML)
+    category:math         questions in a category
+    (a OR b) -c           parentheses group
+
+Postings are sorted arrays of flat bank indices, so boolean queries are
+merges of a few arrays rather than a scan of the bank.
+"""
+
+import bisect
+import re
+
+import numpy as np
+
+_TERM = re.compile(r"[a-z0-9]+")
+_QUERY_TOKEN = re.compile(r"\(|\)|[^\s()]+")
+_FIELDS = ("tag:", "category:")
+# Questions outside a required topic only fill a section the topic can't
+_REST_WEIGHT = 1e-6
+_EMPTY = np.zeros(0, dtype=np.uint32)
+
+
+def terms(text):
+    """Lowercased alphanumeric terms of ``text``."""
+    return _TERM.findall(str(text).lower())
+
+
+def question_terms(question):
+    """Every term a question is indexed under, tags included."""
+    found = set(terms(question["question"]))
+    for option in question["options"]:
+        found.update(terms(option))
+    found.update("tag:" + str(tag).strip().lower() for tag in question.get("tags", ()))
+    return found
+
+
+class SearchIndex:
+    """Term -> sorted flat indices for one bank, with boolean/prefix queries."""
+
+    def __init__(self, bank):
+        self.bank = bank
+        postings = {}
+        index = 0
+        for category in bank:
+            start = index
+            for question in bank[category]:
+                for term in question_terms(question):
+                    postings.setdefault(term, []).append(index)
+                index += 1
+            postings["category:" + category.lower()] = range(start, index)
+        self.size = index
+        self._postings = {
+            term: np.asarray(indices, dtype=np.uint32)
+            for term, indices in postings.items()
+        }
+        self._vocabulary = sorted(self._postings)
+
+    def __len__(self):
+        return len(self._vocabulary)
+
+    def postings(self, term):
+        """Flat indices of the questions containing ``term`` exactly."""
+        return self._postings.get(term, _EMPTY)
+
+    def prefix(self, prefix):
+        """Flat indices of the questions with any term starting with ``prefix``."""
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        matches = []
+        for term in self._vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            matches.append(self._postings[term])
+        if not matches:
+            return _EMPTY
+        return np.unique(np.concatenate(matches))
+
+    def search(self, query):
+        """Sorted flat indices of the questions matching ``query``.
+
+        Raises ValueError for an empty or malformed query.
+        """
+        tokens = _QUERY_TOKEN.findall(query)
+        if not tokens:
+            raise ValueError("Empty search query")
+        parser = _Parser(self, tokens)
+        result = parser.expression()
+        if parser.position != len(tokens):
+            raise ValueError(f"Unexpected {tokens[parser.position]!r} in search query")
+        return result
+
+    def ids(self, query):
+        """Question IDs matching ``query``, in bank order."""
+        return [self.bank.id_of(int(index)) for index in self.search(query)]
+
+    # --- Query evaluation ---
+    def _word(self, word):
+        word = word.lower()
+        if word.startswith(_FIELDS):
+            if word.endswith("*"):
+                return self.prefix(word[:-1])
+            return self.postings(word)
+        parts = terms(word)
+        if not parts:
+            raise ValueError(f"Nothing to search for in {word!r}")
+        if word.endswith("*"):
+            # "addr-mod*" -> addr AND mod*
+            *exact, last = parts
+            found = [self.postings(term) for term in exact] + [self.prefix(last)]
+        else:
+            found = [self.postings(term) for term in parts]
+        result = found[0]
+        for postings in found[1:]:
+            result = np.intersect1d(result, postings, assume_unique=True)
+        return result
+
+
+class _Parser:
+    """Recursive descent over the query tokens.
+
+    expression := conjunction ("OR" conjunction)*
+    conjunction := factor+ (AND is implied; an explicit "AND" is skipped)
+    factor := ("NOT" | "-") factor | "(" expression ")" | word
+    """
+
+    def __init__(self, index, tokens):
+        self.index = index
+        self.tokens = tokens
+        self.position = 0
+
+    def _peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def expression(self):
+        result = self.conjunction()
+        while self._peek() == "OR":
+            self.position += 1
+            result = np.union1d(result, self.conjunction())
+        return result
+
+    def conjunction(self):
+        include = None
+        exclude = []
+        while self._peek() not in (None, "OR", ")"):
+            if self._peek() == "AND":
+                self.position += 1
+                continue
+            postings, negated = self.factor()
+            if negated:
+                exclude.append(postings)
+            elif include is None:
+                include = postings
+            else:
+                include = np.intersect1d(include, postings, assume_unique=True)
+        if include is None:
+            if not exclude:
+                raise ValueError("Search query has an empty group")
+            include = np.arange(self.index.size, dtype=np.uint32)
+        for postings in exclude:
+            include = np.setdiff1d(include, postings, assume_unique=True)
+        return include
+
+    def factor(self):
+        token = self._peek()
+        if token is None:
+            raise ValueError("Search query ends too early")
+        self.position += 1
+        if token == "NOT":
+            postings, negated = self.factor()
+            return postings, not negated
+        if token == "(":
+            result = self.expression()
+            if self._peek() != ")":
+                raise ValueError("Unbalanced parentheses in search query")
+            self.position += 1
+            return result, False
+        if token == ")":
+            raise ValueError("Unbalanced parentheses in search query")
+        if token.startswith("-") and len(token) > 1:
+            return self.index._word(token[1:]), True
+        return self.index._word(token), False
+
+
+# --- Topic-constrained papers ---
+def required_weights(bank, matches, weights=None):
+    """Per-category weights for ``generate_paper`` that favour ``matches``.
+
+    Matching questions keep their weight (from ``weights``, if given);
+    the others get a tiny one, so they are only drawn once a section has
+    used every matching question.
+    """
+    matching = np.zeros(sum(len(bank[category]) for category in bank), dtype=bool)
+    matching[matches] = True
+    combined = {}
+    for category, start in bank.offsets.items():
+        factors = np.where(
+            matching[start : start + len(bank[category])], 1.0, _REST_WEIGHT
+        )
+        if weights is not None and category in weights:
+            factors = factors * np.asarray(weights[category])
+        combined[category] = factors.tolist()
+    return combined
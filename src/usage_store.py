@@ -0,0 +1,128 @@
+import abc
+import json
+import os
+import sqlite3
+import time
+
+from batching import BatchedWriter, process_singleton
+
+# --- Process-wide stores ---
+_stores = {}
+
+
+class UsageStore(abc.ABC):
+    """Per-browser question usage history (most recent first).
+
+    Backends implement ``get``, ``record`` and ``clear``. ``record`` may
+    buffer; ``flush`` makes buffered writes durable.
+    """
+
+    def __init__(self, max_history=50):
+        self.max_history = max_history
+
+    @abc.abstractmethod
+    def get(self, token):
+        """Returns the history of ``token`` as a list (empty if unknown)."""
+
+    @abc.abstractmethod
+    def record(self, token, history):
+        """Replaces the history of ``token`` (capped at ``max_history``)."""
+
+    @abc.abstractmethod
+    def clear(self, token):
+        """Forgets the history of ``token``."""
+
+    def flush(self):
+        pass
+
+
+class MemoryUsageStore(UsageStore):
+    """Keeps histories in a dict; for tests, benchmarks and single-user runs."""
+
+    def __init__(self, max_history=50):
+        super().__init__(max_history)
+        self._histories = {}
+
+    def get(self, token):
+        return list(self._histories.get(token, ()))
+
+    def record(self, token, history):
+        self._histories[token] = tuple(history[: self.max_history])
+
+    def clear(self, token):
+        self._histories.pop(token, None)
+
+
+class SQLiteUsageStore(BatchedWriter, UsageStore):
+    """Usage history in a local SQLite database (WAL mode).
+
+    Writes are coalesced per token and written in one transaction by a
+    background thread, every ``flush_interval`` seconds or once
+    ``batch_size`` tokens are pending, and at interpreter exit. Reads see
+    pending writes.
+    """
+
+    def __init__(self, path, max_history=50, batch_size=32, flush_interval=1.0):
+        UsageStore.__init__(self, max_history)
+        BatchedWriter.__init__(self, "usage-flush", flush_interval, batch_size)
+        self.path = path
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS usage_history (
+                token TEXT PRIMARY KEY,
+                history TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        self._start()
+
+    def get(self, token):
+        with self._io_lock:
+            with self._cond:
+                if token in self._pending:
+                    return list(self._pending[token])
+            row = self._conn.execute(
+                "SELECT history FROM usage_history WHERE token = ?", (token,)
+            ).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def record(self, token, history):
+        with self._cond:
+            self._pending[token] = tuple(history[: self.max_history])
+            self._queued()
+
+    def clear(self, token):
+        with self._io_lock:
+            with self._cond:
+                self._pending.pop(token, None)
+            self._conn.execute("DELETE FROM usage_history WHERE token = ?", (token,))
+            self._conn.commit()
+
+    def _write(self, batch):
+        now = time.time()
+        rows = [
+            (token, json.dumps(list(history)), now) for token, history in batch.items()
+        ]
+        self._conn.executemany(
+            """
+            INSERT INTO usage_history (token, history, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(token) DO UPDATE SET
+                history = excluded.history, updated_at = excluded.updated_at
+            """,
+            rows,
+        )
+        self._conn.commit()
+
+
+def get_usage_store(path, max_history=50):
+    """Returns the process-wide SQLite store for ``path``."""
+    path = os.path.abspath(path)
+    return process_singleton(
+        _stores, path, lambda: SQLiteUsageStore(path, max_history)
+    )
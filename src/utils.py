@@ -1,127 +1,431 @@
+import argparse
+import hashlib
+import json
+import os
+import time
 import yaml
 import re
 
+from bank import compile_bank as _compile_bank, compiled_path, get_bank
+from dedup import build_index
+
+
+# --- Normalization ---
+# Rules are (pattern, replacement) pairs applied in a single pass; earlier
+# rules win when two match at the same position. Text already inside
+# $...$ is never touched, which keeps the pass idempotent.
+MATH_RULES = (
+    # Powers: "x 2" -> $x^2$, "2 n" -> $2^n$
+    (r"\b([a-zA-Z0-9]+)\s+2\b", r"$\1^2$"),
+    (r"\b([a-zA-Z0-9]+)\s+n\b", r"$\1^n$"),
+    # Set complements and unions
+    (r"\b([AB]) '", r"$\1'$"),
+    (r"\bU ", r"$\\cup$ "),
+)
+
+NORMALIZATION_RULES = {"math": MATH_RULES}
+
+_MATH_SPAN = r"\$[^$]*\$"
+_GROUP_REF = re.compile(r"\\(\d+)")
+_normalizers = {}
+
+
+class Normalizer:
+    """Applies a rule set to a string with one compiled regex."""
+
+    def __init__(self, rules):
+        self.rules = tuple(rules)
+        parts = [f"({_MATH_SPAN})"]
+        self._templates = {}
+        group = 2  # group 1 is the math span
+        for pattern, replacement in self.rules:
+            parts.append(f"({pattern})")
+            # Renumber the rule's own \N references into the combined pattern
+            self._templates[group] = _GROUP_REF.sub(
+                lambda m, base=group: f"\\g<{base + int(m[1])}>", replacement
+            )
+            group += 1 + re.compile(pattern).groups
+        self._pattern = re.compile("|".join(parts))
+
+    def _replace(self, match):
+        template = self._templates.get(match.lastindex)
+        return match[0] if template is None else match.expand(template)
+
+    def __call__(self, text):
+        if not isinstance(text, str):
+            return text
+        return self._pattern.sub(self._replace, text)
+
+
+def get_normalizer(category, rules=NORMALIZATION_RULES):
+    """Returns the compiled normalizer for a category, or None if it has no rules."""
+    if category not in rules:
+        return None
+    key = (category, rules[category])
+    normalizer = _normalizers.get(key)
+    if normalizer is None:
+        normalizer = _normalizers[key] = Normalizer(rules[category])
+    return normalizer
+
 
 def fix_math_format(text):
-    if not isinstance(text, str):
-        return text
-    # Generic n power
-    text = re.sub(r"\b([a-zA-Z0-9]+)\s+2\b", r"$\1^2$", text)
-    text = re.sub(r"\b([a-zA-Z0-9]+)\s+n\b", r"$\1^n$", text)
+    """Normalizes math notation (powers, set complements, unions)."""
+    return get_normalizer("math")(text)
 
-    text = text.replace("2 n", "$2^n$")
-    text = text.replace("n 2", "$n^2$")
 
-    # Fix sets
-    text = text.replace("A '", "$A'$")
-    text = text.replace("B '", "$B'$")
-    text = text.replace("U ", "$\cup$ ")
+def _question_scalars(root, rules):
+    """Yields (category, scalar node) for every question, option and answer."""
+    if not isinstance(root, yaml.MappingNode):
+        return
+    for key, value in root.value:
+        if key.value not in rules or not isinstance(value, yaml.SequenceNode):
+            continue
+        for item in value.value:
+            if not isinstance(item, yaml.MappingNode):
+                continue
+            for field, node in item.value:
+                if field.value in ("question", "answer") and isinstance(
+                    node, yaml.ScalarNode
+                ):
+                    yield key.value, node
+                elif field.value == "options" and isinstance(node, yaml.SequenceNode):
+                    for option in node.value:
+                        if isinstance(option, yaml.ScalarNode):
+                            yield key.value, option
 
-    return text
 
+def _block_scalar(source, value):
+    """Re-emits the block scalar ``source`` (``|`` or ``>``) holding ``value``.
 
-def process_file(filename):
-    with open(filename, "r") as f:
-        data = yaml.safe_load(f)
+    The header line, content indentation and trailing blank lines are kept;
+    a folded scalar comes back as a literal one, since its new text would
+    need re-folding. Returns None if ``value`` doesn't read back the same.
+    """
+    header, _, body = source.partition("\n")
+    indents = (
+        len(line) - len(line.lstrip(" ")) for line in body.split("\n") if line.strip()
+    )
+    indent = next(indents, None)
+    if indent is None:
+        return None
+    header = header.replace(">", "|", 1)
+    keep = "+" in header
+    content = value[:-1] if value.endswith("\n") else value
+    lines = "\n".join(
+        " " * indent + line if line else "" for line in content.split("\n")
+    )
+    if keep:
+        tail = "\n" if value.endswith("\n") else ""
+    else:
+        # Blank lines after the text belong to the token but not the value
+        tail = source[len(source.rstrip(" \n")) :] or "\n"
+    replacement = f"{header}\n{lines}{tail}"
+    try:
+        if yaml.safe_load(replacement) != value:
+            return None
+    except yaml.YAMLError:
+        return None
+    return replacement
 
-    if "math" in data:
-        for q in data["math"]:
-            q["question"] = fix_math_format(q["question"])
-            q["options"] = [fix_math_format(opt) for opt in q["options"]]
-            q["answer"] = fix_math_format(q["answer"])
 
-    with open(filename, "w") as f:
-        yaml.dump(data, f, sort_keys=False, allow_unicode=True)
+def process_file(filename, rules=NORMALIZATION_RULES):
+    """Normalizes the bank in place, rewriting only the strings that change.
 
+    Each changed scalar is replaced where it sits in the file: ``|`` and
+    ``>`` block scalars stay blocks with their indentation, and other
+    scalars become double-quoted strings. Everything else is left byte for
+    byte. Returns (strings touched, seconds taken).
+    """
+    started = time.perf_counter()
+    with open(filename, "r") as f:
+        text = f.read()
 
-def parse_markdown_questions(content):
-    questions = []
-    # Split by "Question X"
-    # Note: Qtemp.md has "Question 1", "Question 2" etc.
-    raw_blocks = re.split(r"Question \d+", content)
-
-    # Skips the first split if it's empty (before Question 1)
-    if raw_blocks and not raw_blocks[0].strip():
-        raw_blocks = raw_blocks[1:]
-
-    for i, block in enumerate(raw_blocks):
-        block = block.strip()
-        if not block:
+    edits = []
+    root = yaml.compose(text, Loader=yaml.SafeLoader)  # marks index characters
+    for category, node in _question_scalars(root, rules):
+        fixed = get_normalizer(category, rules)(node.value)
+        if fixed == node.value:
             continue
+        start, end = node.start_mark.index, node.end_mark.index
+        replacement = None
+        if node.style in ("|", ">"):
+            replacement = _block_scalar(text[start:end], fixed)
+        if replacement is None:
+            replacement = json.dumps(fixed, ensure_ascii=False)
+            # Block scalars end after their line break; keep it
+            if text[start:end].endswith("\n"):
+                replacement += "\n"
+        edits.append((start, end, replacement))
 
-        # Specific cleanup for Qtemp.md text
-        # Remove "Options:" if present
-        block = block.replace("Options:", "")
-
-        lines = [line.strip() for line in block.split("\n") if line.strip()]
-
-        # Identify answer index if marked with +1 or +4
-        answer_idx = -1
-        valid_lines = []
-
-        # Filter out score lines but keep track of where they were to find answer
-        for idx, line in enumerate(lines):
-            if re.match(r"^\+\d+$", line):
-                # This marker likely applies to the PREVIOUS line being the answer
-                # identifying which option that was
-                # We need to count how many options we have seen so far?
-                # Actually, simpler: just tag the previous valid line as answer
-                if valid_lines:
-                    # The last added valid line is the answer
-                    # We will mark it later
-                    # Store the content of the answer
-                    answer_content = valid_lines[-1]
-            else:
-                valid_lines.append(line)
-
-        # Heuristic: Last 4 lines are options
-        if len(valid_lines) >= 5:
-            options = valid_lines[-4:]
-            question_lines = valid_lines[:-4]
+    if edits:
+        pieces = []
+        last = 0
+        for start, end, replacement in edits:
+            pieces.append(text[last:start])
+            pieces.append(replacement)
+            last = end
+        pieces.append(text[last:])
+        tmp_name = f"{filename}.tmp"
+        with open(tmp_name, "w") as f:
+            f.write("".join(pieces))
+        os.replace(tmp_name, filename)
+
+    return len(edits), time.perf_counter() - started
+
+
+def compile_file(filename, output=None):
+    """Compiles the YAML bank into the binary artifact that load_questions maps."""
+    output = _compile_bank(filename, output)
+    print(f"Compiled {filename} -> {output}")
+    return output
+
+
+# --- Markdown ingestion ---
+_QUESTION_HEADING = re.compile(r"Question \d+")
+_SCORE_LINE = re.compile(r"^\+\d+$")
+_LIST_ITEM = re.compile(r"^\s*\(?[A-Za-z0-9]+\)[\s\.]")
+_LEADING_NEWLINES = re.compile(r"^\s*[\r\n]+")
+_TOP_LEVEL_KEY = re.compile(r"^[^\s#-][^:]*:")
+
+
+def iter_question_blocks(lines):
+    """Splits a stream of lines into question blocks at each "Question N".
+
+    Yields each block as a list of its stripped, non-empty lines, with
+    "Options:" labels removed. Blank blocks are skipped.
+    """
+    block = []
+    for line in lines:
+        parts = _QUESTION_HEADING.split(line)
+        for i, part in enumerate(parts):
+            if i > 0:
+                if block:
+                    yield block
+                block = []
+            part = part.replace("Options:", "").strip()
+            if part:
+                block.append(part)
+    if block:
+        yield block
+
+
+def parse_question_block(lines):
+    """Turns one block's lines into a question dict, in a single pass."""
+    # Score lines ("+1", "+4") mark the line before them as the answer
+    valid_lines = []
+    marked = set()
+    for line in lines:
+        if _SCORE_LINE.match(line):
+            if valid_lines:
+                marked.add(valid_lines[-1])
         else:
-            # Fallback
-            options = []
-            question_lines = valid_lines
-
-        # Format question lines
-        formatted_q_lines = []
-        for line in question_lines:
-            # Check for match patterns like "(A) ..." or "(a) ..." or "(i) ..."
-            # We want to ensure they start on a new line and are treated as list items
-            # Typical patterns in Qtemp: "(A)", "(B)", etc.
-            if re.match(r"^\s*\(?[A-Za-z0-9]+\)[\s\.]", line):
-                # It's a list item. Prepend explicit newline and bullet if not already
-                formatted_q_lines.append(f"\n- {line}")
-            else:
-                formatted_q_lines.append(line)
-
-        question_text = "\n".join(formatted_q_lines)
-
-        # Clean question text
-        question_text = re.sub(r"^\s*[\r\n]+", "", question_text)
-
-        # Determine answer string
-        final_answer = ""
-        # scan original block for the answer marker again to match with options
-        # or use logic above?
-        # Let's try to match options with lines followed by +1
-
-        for opt in options:
-            # specific check if this option was followed by +1 in the original non-filtered lines
-            # This is tricky because duplicates.
-            # Let's search in the original block context
-            # regex: option_text \s+ \+\d
-            escaped_opt = re.escape(opt)
-            if re.search(f"{escaped_opt}\s*\n\s*\+\d", block):
-                final_answer = opt
-                break
-
-        questions.append(
-            {"question": question_text, "options": options, "answer": final_answer}
+            valid_lines.append(line)
+
+    # Heuristic: Last 4 lines are options
+    if len(valid_lines) >= 5:
+        options = valid_lines[-4:]
+        question_lines = valid_lines[:-4]
+    else:
+        # Fallback
+        options = []
+        question_lines = valid_lines
+
+    # Lines like "(A) ..." become their own list items
+    formatted_q_lines = [
+        f"\n- {line}" if _LIST_ITEM.match(line) else line for line in question_lines
+    ]
+    question_text = _LEADING_NEWLINES.sub("", "\n".join(formatted_q_lines))
+
+    final_answer = next((opt for opt in options if opt in marked), "")
+    return {"question": question_text, "options": options, "answer": final_answer}
+
+
+def iter_markdown_questions(lines):
+    """Yields question dicts parsed from a stream of Markdown lines."""
+    for block in iter_question_blocks(lines):
+        yield parse_question_block(block)
+
+
+def parse_markdown_questions(content):
+    """Parses a whole Markdown string; see iter_markdown_questions for streams."""
+    return list(iter_markdown_questions(content.splitlines()))
+
+
+def is_complete_question(question):
+    """True if a parsed question has four options and a marked answer."""
+    return len(question["options"]) == 4 and bool(question["answer"])
+
+
+def block_fingerprint(block):
+    """Stable hash of a question block, used to remember what was ingested."""
+    return hashlib.blake2b("\n".join(block).encode("utf-8"), digest_size=12).hexdigest()
+
+
+def append_questions(filename, category, questions):
+    """Appends questions to one category of a YAML bank without re-dumping it.
+
+    Only the new entries are rendered; the rest of the file is copied through
+    untouched (or, when the category comes last, not rewritten at all).
+    """
+    if not questions:
+        return
+    rendered = yaml.dump(list(questions), sort_keys=False, allow_unicode=True)
+
+    with open(filename, "r") as f:
+        lines = f.readlines()
+    missing_newline = bool(lines) and not lines[-1].endswith("\n")
+    if missing_newline:
+        lines[-1] += "\n"
+
+    start = next(
+        (i for i, line in enumerate(lines) if line.rstrip() == f"{category}:"), None
+    )
+    if start is None:
+        end = len(lines)
+        rendered = f"{category}:\n{rendered}"
+    else:
+        end = next(
+            (i for i in range(start + 1, len(lines)) if _TOP_LEVEL_KEY.match(lines[i])),
+            len(lines),
         )
+        if end < len(lines):
+            # Keep blank lines separating the category from the next one
+            while end > start + 1 and not lines[end - 1].strip():
+                end -= 1
+
+    if end == len(lines):
+        # Nothing follows the insertion point: append instead of rewriting
+        with open(filename, "a") as f:
+            if missing_newline:
+                f.write("\n")
+            f.write(rendered)
+        return
+
+    tmp_name = f"{filename}.tmp"
+    with open(tmp_name, "w") as f:
+        f.writelines(lines[:end])
+        f.write(rendered)
+        f.writelines(lines[end:])
+    os.replace(tmp_name, filename)
 
-    return questions
+
+class BankAppender:
+    """Adds parsed questions to one category of a YAML bank.
+
+    Markdown ingestion and the PDF importer both go through this. ``add``
+    normalizes a question with the category's rules, then drops it if it is
+    incomplete or a near-duplicate of the bank (or of a question added
+    before). ``flush`` appends the kept questions to the YAML, and ``close``
+    flushes and rebuilds the compiled artifact, if the bank has one, so it
+    matches the YAML again.
+    """
+
+    def __init__(self, filename, category):
+        self.filename = filename
+        self.category = category
+        self.normalize = get_normalizer(category)
+        self.added = self.skipped = self.duplicates = 0
+        self._index = build_index(get_bank(filename))
+        self._batch = []
+
+    def __len__(self):
+        return len(self._batch)
+
+    def add(self, question):
+        """Normalizes and queues one question; returns whether it was kept."""
+        if self.normalize:
+            question["question"] = self.normalize(question["question"])
+            question["options"] = [self.normalize(opt) for opt in question["options"]]
+            question["answer"] = self.normalize(question["answer"])
+        if not is_complete_question(question):
+            self.skipped += 1
+            return False
+        if self._index.add(question) is not None:
+            self.duplicates += 1
+            return False
+        self._batch.append(question)
+        self.added += 1
+        return True
+
+    def flush(self):
+        """Appends the queued questions to the YAML bank."""
+        append_questions(self.filename, self.category, self._batch)
+        self._batch = []
+
+    def close(self):
+        self.flush()
+        if self.added and os.path.exists(compiled_path(self.filename)):
+            _compile_bank(self.filename)
+
+
+def ingest_markdown(source, filename, category, state_file=None, batch_size=500):
+    """Streams a Markdown dump into one category of the YAML bank.
+
+    Blocks are parsed one at a time and written in batches of ``batch_size``.
+    Fingerprints of ingested blocks are kept in ``state_file`` (default:
+    ``<source>.ingested``), so re-running on a grown file only adds the new
+    questions. Questions go through ``BankAppender``: they are normalized
+    for the category, blocks without four options and a marked answer are
+    skipped, near-duplicates of questions in the bank (or earlier in the
+    dump) are rejected, and a compiled artifact is rebuilt at the end.
+    Returns (added, skipped, duplicates).
+    """
+    state_file = state_file or f"{source}.ingested"
+    seen = set()
+    if os.path.exists(state_file):
+        with open(state_file) as f:
+            seen.update(line.strip() for line in f)
+
+    appender = BankAppender(filename, category)
+    fingerprints = []
+
+    def flush():
+        appender.flush()
+        # Remember blocks only once their questions are safely in the bank
+        with open(state_file, "a") as f:
+            f.writelines(f"{fp}\n" for fp in fingerprints)
+        fingerprints.clear()
+
+    with open(source, "r") as f:
+        for block in iter_question_blocks(f):
+            fingerprint = block_fingerprint(block)
+            if fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            fingerprints.append(fingerprint)
+            appender.add(parse_question_block(block))
+            if len(appender) >= batch_size:
+                flush()
+    flush()
+    appender.close()
+    return appender.added, appender.skipped, appender.duplicates
 
 
 if __name__ == "__main__":
-    process_file("QuestionBank.yaml")
+    parser = argparse.ArgumentParser(description="Question bank maintenance")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default="fix-math",
+        choices=["fix-math", "compile", "ingest"],
+        help=(
+            "fix-math: normalize math notation in place; compile: build the "
+            ".qbank artifact; ingest: add new questions from a Markdown dump"
+        ),
+    )
+    parser.add_argument("--bank", default="QuestionBank.yaml")
+    parser.add_argument("--source", default="Qtemp.md", help="Markdown dump to ingest")
+    parser.add_argument("--category", default="cs", help="Bank category to ingest into")
+    args = parser.parse_args()
+
+    if args.command == "compile":
+        compile_file(args.bank)
+    elif args.command == "ingest":
+        added, skipped, rejected = ingest_markdown(args.source, args.bank, args.category)
+        print(
+            f"Ingested {added} questions into {args.category} "
+            f"({skipped} skipped, {rejected} near-duplicates)"
+        )
+    else:
+        touched, elapsed = process_file(args.bank)
+        print(f"Normalized {touched} strings in {args.bank} ({elapsed:.2f}s)")
@@ -0,0 +1,178 @@
+"""Checks the vectorized scoring engine against the per-question loop it replaced."""
+
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from scoring import (  # noqa: E402
+    MarkingScheme,
+    answer_key,
+    score_batch,
+    score_submission,
+)
+
+CATEGORIES = ["cs", "math", "logical_reasoning"]
+
+
+class FakeBank:
+    """The two lookups ``answer_key`` uses, over one list per category."""
+
+    def __init__(self, questions):
+        self.questions = questions
+        self.flat = [
+            (category, position)
+            for category, items in questions.items()
+            for position in range(len(items))
+        ]
+
+    def __getitem__(self, category):
+        return self.questions[category]
+
+    def locate(self, index):
+        return self.flat[index]
+
+
+def make_bank(rng, per_category=40):
+    questions = {}
+    for category in CATEGORIES + ["general"]:  # "general" has no section
+        items = []
+        for n in range(per_category):
+            options = [f"{category}-{n}-{k}" for k in range(4)]
+            kind = rng.random()
+            if kind < 0.1:
+                answer = "not an option"
+            elif kind < 0.2:
+                options[3] = options[1]  # repeated option text
+                answer = options[1]
+            else:
+                answer = rng.choice(options)
+            items.append({"question": f"q{n}", "options": options, "answer": answer})
+        questions[category] = items
+    return FakeBank(questions)
+
+
+def loop_score(bank, paper, choices, times, scheme):
+    """The results-page loop from before the engine, with configurable marks."""
+    stats = {
+        sec: {"correct": 0, "wrong": 0, "unattempted": 0, "score": 0, "time": 0.0}
+        for sec in CATEGORIES
+    }
+    totals = {"score": 0, "correct": 0, "wrong": 0, "unattempted": 0}
+    for i, index in enumerate(paper):
+        category, position = bank.locate(index)
+        q = bank[category][position]
+        choice = choices[i]
+        user_ans = q["options"][choice - 1] if choice else None
+        if category in stats:
+            stats[category]["time"] += times[i]
+        if user_ans is None:
+            outcome, mark = "unattempted", scheme.unattempted
+        elif user_ans == q["answer"]:
+            outcome, mark = "correct", scheme.correct
+        else:
+            outcome, mark = "wrong", scheme.wrong
+        totals[outcome] += 1
+        totals["score"] += mark
+        if category in stats:
+            stats[category][outcome] += 1
+            stats[category]["score"] += mark
+    return totals, stats
+
+
+def random_submission(rng, bank, size=75):
+    paper = rng.sample(range(len(bank.flat)), size)
+    choices = bytearray(rng.randrange(5) for _ in paper)
+    times = [rng.uniform(0, 120) for _ in paper]
+    return paper, choices, times
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize(
+    "scheme", [MarkingScheme(), MarkingScheme(correct=3, wrong=-0.5, unattempted=0)]
+)
+def test_score_submission_matches_loop(seed, scheme):
+    rng = random.Random(seed)
+    bank = make_bank(rng)
+    paper, choices, times = random_submission(rng, bank)
+    answers, sections = answer_key(bank, paper, CATEGORIES)
+    report = score_submission(
+        choices, answers, sections, times, len(CATEGORIES), scheme
+    )
+
+    totals, stats = loop_score(bank, paper, choices, times, scheme)
+    assert report.score == pytest.approx(totals["score"])
+    assert report.correct == totals["correct"]
+    assert report.wrong == totals["wrong"]
+    assert report.unattempted == totals["unattempted"]
+    for category, section in zip(CATEGORIES, report.sections):
+        expected = stats[category]
+        answered = expected["correct"] + expected["wrong"] + expected["unattempted"]
+        assert section.correct == expected["correct"]
+        assert section.wrong == expected["wrong"]
+        assert section.unattempted == expected["unattempted"]
+        assert section.score == pytest.approx(expected["score"])
+        assert section.time == pytest.approx(expected["time"])
+        assert section.avg_time == pytest.approx(expected["time"] / max(1, answered))
+
+
+def test_every_option_index():
+    rng = random.Random(0)
+    bank = make_bank(rng, per_category=5)
+    paper = list(range(len(bank.flat)))
+    answers, sections = answer_key(bank, paper, CATEGORIES)
+    for choice in range(5):  # unattempted, then each of the four options
+        choices = bytearray([choice] * len(paper))
+        times = [1.0] * len(paper)
+        report = score_submission(choices, answers, sections, times, len(CATEGORIES))
+        totals, _ = loop_score(bank, paper, choices, times, MarkingScheme())
+        assert (report.correct, report.wrong, report.unattempted) == (
+            totals["correct"],
+            totals["wrong"],
+            totals["unattempted"],
+        )
+        expected = [
+            0
+            if not choice
+            else 1
+            if bank[c][p]["options"][choice - 1] == bank[c][p]["answer"]
+            else -1
+            for c, p in (bank.locate(index) for index in paper)
+        ]
+        assert report.outcomes.tolist() == expected
+
+
+def test_score_batch_matches_single_submissions():
+    rng = random.Random(1)
+    bank = make_bank(rng)
+    paper = rng.sample(range(len(bank.flat)), 75)
+    answers, sections = answer_key(bank, paper, CATEGORIES)
+    choices = np.array([[rng.randrange(5) for _ in paper] for _ in range(50)])
+    times = np.array([[rng.uniform(0, 60) for _ in paper] for _ in range(50)])
+
+    batch = score_batch(
+        choices,
+        np.tile(answers, (50, 1)),
+        np.tile(sections, (50, 1)),
+        times,
+        len(CATEGORIES),
+    )
+    for row in range(50):
+        totals, stats = loop_score(
+            bank, paper, choices[row], times[row], MarkingScheme()
+        )
+        assert batch["score"][row] == totals["score"]
+        assert batch["correct"][row] == totals["correct"]
+        assert batch["wrong"][row] == totals["wrong"]
+        assert batch["unattempted"][row] == totals["unattempted"]
+        for s, category in enumerate(CATEGORIES):
+            assert batch["section_correct"][row, s] == stats[category]["correct"]
+            assert batch["section_wrong"][row, s] == stats[category]["wrong"]
+            assert batch["section_score"][row, s] == stats[category]["score"]
+            expected_time = pytest.approx(stats[category]["time"])
+            assert batch["section_time"][row, s] == expected_time